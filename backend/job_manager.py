@@ -1,6 +1,5 @@
 """Job management for background execution using GCS or local storage."""
 
-import json
 import os
 import uuid
 from datetime import datetime
@@ -8,12 +7,16 @@ from typing import Dict, Any, Optional
 from pathlib import Path
 import logging
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
 GCS_BUCKET = os.getenv("GCS_BUCKET")
 GCS_PREFIX = os.getenv("GCS_PREFIX", "")
 DATA_BASE_DIR = os.getenv("DATA_DIR", "data")
+# 1にするとジョブファイルをインデント付きで書く（デバッグ用）
+JSON_OPTION = orjson.OPT_INDENT_2 if os.getenv("JSON_INDENT") == "1" else 0
 
 
 class JobManager:
@@ -107,8 +110,7 @@ class JobManager:
             if not blob.exists():
                 return None
             try:
-                data = blob.download_as_text()
-                return json.loads(data)
+                return orjson.loads(blob.download_as_bytes())
             except Exception as e:
                 logger.error(f"Failed to get job from GCS: {e}")
                 return None
@@ -118,9 +120,9 @@ class JobManager:
             if not os.path.exists(path):
                 return None
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
+                with open(path, 'rb') as f:
+                    return orjson.loads(f.read())
+            except (orjson.JSONDecodeError, IOError) as e:
                 logger.error(f"Failed to get job from local storage: {e}")
                 return None
 
@@ -254,15 +256,17 @@ class JobManager:
         if self.backend == "gcs":
             blob = self.bucket.blob(self._job_path_gcs(project_id, job_id))
             blob.upload_from_string(
-                json.dumps(job_data, ensure_ascii=False, indent=2),
+                orjson.dumps(job_data, option=JSON_OPTION),
                 content_type="application/json"
             )
         else:
             # ローカルストレージ
             path = self._job_path_local(project_id, job_id)
             Path(path).parent.mkdir(parents=True, exist_ok=True)
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(job_data, f, indent=2, ensure_ascii=False)
+            # ステージ更新のたびに全体を書き直すため、エンコードはorjsonで行う
+            # （orjsonは非ASCII文字をそのまま出力するので ensure_ascii=False と同じ形式）
+            with open(path, 'wb') as f:
+                f.write(orjson.dumps(job_data, option=JSON_OPTION))
 
 
 # グローバルインスタンス
@@ -0,0 +1,132 @@
+"""LLMレスポンスキャッシュ（メモリLRU + ディスク永続化）
+
+COUNCIL_CACHE=1 のときのみ有効。同一の (model, messages) に対するレスポンスを
+プロセス内のLRUとSQLiteファイルに保存し、サーバーを再起動しても再利用できる。
+プロンプト調整中に同じカウンシルを何度も実行する開発用途を想定している。
+
+参照順: メモリLRU → ディスク → ネットワーク（ディスクヒット時はLRUにも載せる）
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# キャッシュ設定
+CACHE_ENABLED = os.getenv("COUNCIL_CACHE") == "1"
+CACHE_DIR = os.getenv("COUNCIL_CACHE_DIR", "~/.cache/llm-council")
+CACHE_TTL_S = 86400  # 1日
+MEMORY_MAX_ENTRIES = 256
+DISK_MAX_BYTES = 2 << 30  # ディスクキャッシュの上限（レスポンス本体の合計、2GiB）
+
+
+def make_key(model: str, messages: List[Dict[str, Any]]) -> str:
+    """モデルとメッセージ列からキャッシュキーを生成"""
+    return hashlib.sha256(orjson.dumps([model, messages])).hexdigest()
+
+
+class ResponseCache:
+    """メモリLRUとSQLiteを組み合わせたレスポンスキャッシュ"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttl_s: int = CACHE_TTL_S,
+        memory_max_entries: int = MEMORY_MAX_ENTRIES,
+        disk_max_bytes: int = DISK_MAX_BYTES
+    ):
+        self.ttl_s = ttl_s
+        self.memory_max_entries = memory_max_entries
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        path = os.path.expanduser(cache_dir)
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, "responses.sqlite3"), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+            # 期限切れのエントリを起動時に掃除
+            self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        """メモリLRUに登録（上限超過時は最も古いものを追い出す）"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """キャッシュを参照（なければNone）"""
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                if hit[0] >= now:
+                    self._memory.move_to_end(key)
+                    return hit[1]
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                return None
+            value = orjson.loads(row[0])
+            self._remember(key, row[1], value)
+            return value
+
+    def _evict(self, now: float) -> None:
+        """期限切れのエントリを消し、上限を超えていれば期限の近いものから追い出す"""
+        self._db.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        total = self._db.execute("SELECT COALESCE(SUM(length(value)), 0) FROM responses").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+        evicted = []
+        for key, size in self._db.execute("SELECT key, length(value) FROM responses ORDER BY expires_at"):
+            if total <= self.disk_max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        for (key,) in evicted:
+            self._memory.pop(key, None)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """キャッシュに保存（メモリとディスクの両方、ディスクは disk_max_bytes まで）"""
+        now = time.time()
+        expires_at = now + self.ttl_s
+        with self._lock:
+            self._remember(key, expires_at, value)
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, orjson.dumps(value), expires_at)
+                )
+                self._evict(now)
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """有効時のみキャッシュインスタンスを返す（COUNCIL_CACHE=1 でなければNone）"""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResponseCache(CACHE_DIR)
+        logger.info(f"LLM response cache enabled (dir: {CACHE_DIR})")
+    return _cache
@@ -19,8 +19,11 @@ import bcrypt
 import uuid
 import json
 import asyncio
+from contextlib import asynccontextmanager
 
 from . import storage
+from . import openrouter
+from . import tools
 from .config import get_config, save_config
 from .council import run_full_council, generate_conversation_title, stage1_collect_responses, stage2_collect_rankings, stage3_synthesize_final, calculate_aggregate_rankings
 from .memory_extractor import extract_memory_from_conversation, generate_conversation_summary
@@ -28,7 +31,24 @@ from .llm_logger import LLMLogger
 from .tools import ToolLogger
 from .job_manager import get_job_manager
 
-app = FastAPI(title="LLM Council API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリのライフサイクル管理（起動時にストレージを初期化し、終了時に遅延書き込みの書き出しと共有HTTPクライアントのクローズ）"""
+    # uvloopが有効か確認できるよう、実際に動いているイベントループを記録
+    loop = asyncio.get_running_loop()
+    logger.info(f"Event loop: {type(loop).__module__}.{type(loop).__name__}")
+    try:
+        await asyncio.to_thread(storage.warm_up)
+    except Exception as e:
+        # 起動は止めず、初回アクセス時に改めて生成を試みる
+        logger.warning(f"Storage warm-up failed: {e}")
+    yield
+    await asyncio.to_thread(storage.flush)
+    await openrouter.close_client()
+    await tools.close_client()
+
+
+app = FastAPI(title="LLM Council API", lifespan=lifespan)
 
 # CORS configuration from environment variable (comma-separated origins, or "*" for all)
 allowed_origins = [origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", "*").split(",")]
@@ -798,4 +818,5 @@ if os.path.isdir("frontend_dist"):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # loop="auto": uvloopがインストールされていれば（uvicorn[standard]で導入済み）uvloopを使う
+    uvicorn.run(app, host="0.0.0.0", port=8001, loop="auto")
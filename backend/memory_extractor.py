@@ -155,8 +155,9 @@ async def extract_memory_from_conversation(
             logger.debug("No memory to extract")
             return []
 
-        # 抽出されたメモリを保存
+        # 抽出されたメモリを保存（新規追加分は最後にまとめて書き込む）
         saved_entries = []
+        new_entries = []
         for item in extracted_data["extracted"]:
             # 確信度チェック
             if item.get("confidence", 0) < 0.7:
@@ -186,12 +187,16 @@ async def extract_memory_from_conversation(
                         break
                 if not updated:
                     # 見つからなければ新規追加
-                    result = storage.add_memory_entry(entry, project_id)
-                    saved_entries.append(result)
+                    new_entries.append(entry)
+                    saved_entries.append(entry)
             else:
                 # 新規追加
-                result = storage.add_memory_entry(entry, project_id)
-                saved_entries.append(result)
+                new_entries.append(entry)
+                saved_entries.append(entry)
+
+        if new_entries:
+            # IDと抽出日時は add_memory_entries が各エントリに付与する
+            storage.add_memory_entries(new_entries, project_id)
 
         logger.info(f"Extracted {len(saved_entries)} memory entries")
         return saved_entries
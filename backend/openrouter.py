@@ -2,20 +2,320 @@
 
 import httpx
 import asyncio
-import json
+import gzip
+import orjson
+import math
+import random
+import sys
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
 from .config import OPENROUTER_API_KEY, OPENROUTER_API_URL
+from . import llm_cache
 
 logger = logging.getLogger(__name__)
 
+# リトライ設定（429 / 5xxゲートウェイ系 / 通信エラーのみ再試行）
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+MAX_RETRY_ATTEMPTS = 4
+RETRY_BACKOFF_INITIAL_S = 0.5
+RETRY_BACKOFF_MAX_S = 8.0
+RETRY_AFTER_MAX_S = 30.0
+
+# asyncio.TaskGroup は Python 3.11+ のみ
+_HAS_TASK_GROUP = sys.version_info >= (3, 11)
+
+# プロセス全体で共有するHTTPクライアント（keep-alive接続をリクエスト間で再利用）
+_client: Optional[httpx.AsyncClient] = None
+# リクエストボディのgzip圧縮設定
+# 圧縮は数KBでも約60μsの固定コストがかかる一方、数KB未満のボディは
+# 元々数パケットで送れるため削減効果がほぼない。閾値以下は無圧縮で送る
+GZIP_MIN_BYTES = 4096
+GZIP_LEVEL = 3
+# gzipボディが拒否されたとみなすステータス（415 Unsupported Media Type と、
+# Content-Encoding を解釈しないサーバー・プロキシが返す 400）。無圧縮で送り直し、
+# 415か、送り直しが成功した400なら以降はプロセス全体で圧縮をやめる
+GZIP_REJECTED_STATUS_CODES = {400, 415}
+_gzip_supported = True
+
+# HTTP/2では1接続で複数ストリームを多重化できるため、接続数の上限は小さくてよい
+MAX_CONNECTIONS = 32
+# ネゴシエートされたHTTPバージョンを一度だけログに出すためのフラグ
+_http_version_logged = False
+
+
+def _get_client() -> httpx.AsyncClient:
+    """共有AsyncClientを取得（未作成・クローズ済みなら作成）"""
+    global _client
+    if _client is None or _client.is_closed:
+        # 認証ヘッダーはクライアント生成時に一度だけ設定する
+        # （ボディは content= でバイト列を渡すため Content-Type も明示が必要）
+        _client = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            http2=True,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """共有AsyncClientをクローズ（アプリ終了時に呼ぶ）"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _parse_args(raw: Any) -> Dict[str, Any]:
+    """
+    ツール引数を正規化してdictにする
+
+    プロバイダーによってはパース済みのdictを返すため、その場合はそのまま使う。
+    文字列/バイト列はorjsonでパースし、不正な値は警告を出して空dictとして扱う。
+    """
+    if isinstance(raw, dict):
+        return raw
+    if not raw:
+        return {}
+    try:
+        parsed = orjson.loads(raw)
+    except (orjson.JSONDecodeError, TypeError):
+        logger.warning(f"Malformed tool arguments, ignoring: {raw!r:.200}")
+        return {}
+    if not isinstance(parsed, dict):
+        logger.warning(f"Tool arguments are not an object, ignoring: {raw!r:.200}")
+        return {}
+    return parsed
+
+
+def _log_http_version(response: httpx.Response) -> None:
+    """最初のレスポンスでネゴシエートされたHTTPバージョンをログに出す"""
+    global _http_version_logged
+    if _http_version_logged:
+        return
+    _http_version_logged = True
+    if response.http_version == "HTTP/2":
+        logger.info("OpenRouter connection negotiated HTTP/2")
+    else:
+        logger.warning(f"OpenRouter connection fell back to {response.http_version} (HTTP/2 not negotiated)")
+
+
+def _backoff_delay(attempt: int) -> float:
+    """指数バックオフ + ジッターの待機秒数（attemptは1始まり）"""
+    delay = RETRY_BACKOFF_INITIAL_S * (2 ** (attempt - 1))
+    return min(RETRY_BACKOFF_MAX_S, delay + random.uniform(0, RETRY_BACKOFF_INITIAL_S))
+
+
+def _retry_after_delay(response: httpx.Response) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数 or HTTP日付）を待機秒数に変換"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(RETRY_AFTER_MAX_S, max(0.0, seconds))
+
+
+def _build_body(model_json: bytes, encoded_messages: List[bytes], extra: bytes = b"") -> bytes:
+    """
+    シリアライズ済みのメッセージ断片を連結してリクエストボディを組み立てる
+
+    ツールループではメッセージが1往復ごとに増えていくため、履歴全体を毎回
+    dumpsし直す代わりに、各メッセージは追加時に一度だけシリアライズしておく。
+
+    Args:
+        model_json: orjson.dumps(model) 済みのモデルID
+        encoded_messages: orjson.dumps 済みのメッセージ列
+        extra: 末尾に追加するフィールド（先頭カンマ付き、例: b',"tools":[...]'）
+    """
+    return b"".join((
+        b'{"model":', model_json,
+        b',"messages":[', b",".join(encoded_messages), b"]",
+        extra,
+        b"}",
+    ))
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    body: bytes,
+    compressed: Optional[bytes],
+    timeout: float
+) -> httpx.Response:
+    """
+    1回分のPOSTを送信（圧縮ボディがあればgzipで送り、400/415なら無圧縮で送り直す）
+    """
+    global _gzip_supported
+    if compressed is None or not _gzip_supported:
+        return await client.post(OPENROUTER_API_URL, content=body, timeout=timeout)
+    response = await client.post(
+        OPENROUTER_API_URL,
+        content=compressed,
+        headers={"Content-Encoding": "gzip"},
+        timeout=timeout
+    )
+    if response.status_code not in GZIP_REJECTED_STATUS_CODES:
+        return response
+    fallback = await client.post(OPENROUTER_API_URL, content=body, timeout=timeout)
+    # 400は圧縮と無関係な不正リクエストでも返るため、無圧縮で通った場合だけ圧縮の問題とみなす
+    if response.status_code == 415 or fallback.is_success:
+        _gzip_supported = False
+        logger.warning(
+            f"OpenRouter rejected gzip request body ({response.status_code}), sending uncompressed from now on"
+        )
+    return fallback
+
+
+async def _post_with_retry(
+    body: bytes,
+    timeout: float
+) -> httpx.Response:
+    """
+    OpenRouterにPOSTし、一時的なエラーは指数バックオフで再試行する
+
+    429/502/503/504 と httpx.TransportError を最大 MAX_RETRY_ATTEMPTS 回まで再試行。
+    429 等で Retry-After が返された場合はその秒数を優先する。
+    それ以外のHTTPエラーは即座に raise_for_status() で例外化する。
+    GZIP_MIN_BYTES を超えるボディはgzip圧縮して送る（圧縮は再試行間で使い回す）。
+    """
+    client = _get_client()
+    compressed = None
+    if _gzip_supported and len(body) > GZIP_MIN_BYTES:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    for attempt in range(1, MAX_RETRY_ATTEMPTS + 1):
+        try:
+            response = await _send(client, body, compressed, timeout)
+        except httpx.TransportError as e:
+            if attempt == MAX_RETRY_ATTEMPTS:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning(
+                f"OpenRouter transport error ({e!r}), retrying in {delay:.2f}s "
+                f"(attempt {attempt}/{MAX_RETRY_ATTEMPTS})"
+            )
+        else:
+            _log_http_version(response)
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == MAX_RETRY_ATTEMPTS:
+                response.raise_for_status()
+                return response
+            delay = _retry_after_delay(response)
+            if delay is None:
+                delay = _backoff_delay(attempt)
+            logger.warning(
+                f"OpenRouter returned {response.status_code}, retrying in {delay:.2f}s "
+                f"(attempt {attempt}/{MAX_RETRY_ATTEMPTS})"
+            )
+        await asyncio.sleep(delay)
+
+
+def _shared_response(result: Dict[str, Any], start_time: float, **flags: bool) -> Dict[str, Any]:
+    """
+    キャッシュや合流で他のリクエストの結果を再利用する場合のレスポンス
+
+    トークン使用量は実際にAPIを呼んだ側だけが計上するため0にする
+    """
+    return {
+        **result,
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        'response_time_ms': int((time.time() - start_time) * 1000),
+        **flags,
+    }
+
+
+@dataclass
+class _InflightRequest:
+    """実行中のリクエストと、その結果を待っている呼び出し元の数"""
+    task: "asyncio.Future[Optional[Dict[str, Any]]]"
+    waiters: int = 0
+
+
+# 実行中の query_model リクエスト（キー: llm_cache.make_key）
+_inflight: Dict[str, _InflightRequest] = {}
+
+
+def _discard_inflight(key: str, entry: _InflightRequest) -> None:
+    """登録済みのエントリが自分自身の場合のみ削除（後続の新規リクエストを消さない）"""
+    if _inflight.get(key) is entry:
+        del _inflight[key]
+
+
+async def _coalesce(
+    key: str,
+    fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    同一キーのリクエストを1回の実行にまとめる
+
+    最初の呼び出し元がfetchをタスクとして起動し、同じキーで後から来た
+    呼び出し元はそのタスクの完了を待つ。待機者が全員キャンセルされた
+    場合のみタスク自体もキャンセルする（一人のキャンセルで他の待機者を
+    巻き込まないよう、待機は shield 越しに行う）。
+
+    Returns:
+        (結果, 自分がfetchを起動したか)
+    """
+    entry = _inflight.get(key)
+    is_leader = entry is None
+    if is_leader:
+        entry = _InflightRequest(asyncio.ensure_future(fetch()))
+        _inflight[key] = entry
+        entry.task.add_done_callback(lambda _: _discard_inflight(key, entry))
+
+    entry.waiters += 1
+    try:
+        return await asyncio.shield(entry.task), is_leader
+    finally:
+        entry.waiters -= 1
+        if entry.waiters == 0 and not entry.task.done():
+            _discard_inflight(key, entry)
+            entry.task.cancel()
+
+
+def _build_response(
+    message: Dict[str, Any],
+    usage: Dict[str, Any],
+    model: str,
+    response_time_ms: int
+) -> Dict[str, Any]:
+    """APIレスポンスのmessage/usageから共通形式のレスポンスdictを作る"""
+    return {
+        'content': message.get('content'),
+        'reasoning_details': message.get('reasoning_details'),
+        'usage': {
+            'prompt_tokens': usage.get('prompt_tokens', 0),
+            'completion_tokens': usage.get('completion_tokens', 0),
+            'total_tokens': usage.get('total_tokens', 0),
+        },
+        'model': model,
+        'response_time_ms': response_time_ms,
+    }
+
+
+def _split_usage(usage: Dict[str, Any], parts: int, index: int) -> Dict[str, int]:
+    """共有リクエストのトークン使用量を parts 個に均等按分（端数は先頭に寄せる）"""
+    split = {}
+    for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+        total = usage.get(key, 0)
+        split[key] = total // parts + (total % parts if index == 0 else 0)
+    return split
+
 
 async def query_model(
     model: str,
     messages: List[Dict[str, str]],
     system_prompt: Optional[str] = None,
-    timeout: float = 120.0
+    timeout: float = 120.0,
+    coalesce: bool = True
 ) -> Optional[Dict[str, Any]]:
     """
     Query a single model via OpenRouter API.
@@ -25,6 +325,8 @@ async def query_model(
         messages: List of message dicts with 'role' and 'content'
         system_prompt: Optional system prompt to prepend
         timeout: Request timeout in seconds
+        coalesce: 実行中の同一リクエストがあれば結果を共有する
+            （独立したサンプルが必要な場合はFalse）
 
     Returns:
         Response dict with 'content', 'reasoning_details', 'usage', 'model',
@@ -32,11 +334,6 @@ async def query_model(
     """
     start_time = time.time()
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
     # Build messages with optional system prompt
     final_messages = []
     if system_prompt:
@@ -48,36 +345,114 @@ async def query_model(
         "messages": final_messages,
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                OPENROUTER_API_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
+    key = llm_cache.make_key(model, final_messages)
+
+    # レスポンスキャッシュ（COUNCIL_CACHE=1 のときのみ）
+    cache = llm_cache.get_cache()
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"Cache hit for {model}")
+            return _shared_response(cached, start_time, cached=True)
 
-            data = response.json()
+    async def fetch() -> Optional[Dict[str, Any]]:
+        try:
+            response = await _post_with_retry(orjson.dumps(payload), timeout)
+
+            data = orjson.loads(response.content)
             message = data['choices'][0]['message']
             usage = data.get('usage', {})
 
+            # リトライ待ちも含めたユーザー体感のレイテンシ
             response_time_ms = int((time.time() - start_time) * 1000)
 
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details'),
-                'usage': {
-                    'prompt_tokens': usage.get('prompt_tokens', 0),
-                    'completion_tokens': usage.get('completion_tokens', 0),
-                    'total_tokens': usage.get('total_tokens', 0),
-                },
-                'model': model,
-                'response_time_ms': response_time_ms,
-            }
+            result = _build_response(message, usage, model, response_time_ms)
+            if cache is not None:
+                cache.set(key, result)
+            return result
+
+        except Exception as e:
+            logger.error(f"Error querying model {model}: {e}")
+            return None
+
+    if not coalesce:
+        return await fetch()
+
+    # 同一リクエストが実行中ならその結果を待つ（リクエストの合流）
+    result, is_leader = await _coalesce(key, fetch)
+    if result is None or is_leader:
+        return result
+    logger.info(f"Coalesced in-flight request for {model}")
+    return _shared_response(result, start_time, coalesced=True)
+
+
+async def query_model_n(
+    model: str,
+    messages: List[Dict[str, str]],
+    n: int,
+    system_prompt: Optional[str] = None,
+    timeout: float = 120.0
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    同一プロンプトで n 個の回答を1リクエスト（"n" パラメータ）で取得
+
+    トークン使用量は n 個の回答に均等に按分する。
+    プロバイダーが "n" を無視して返した choices が n 未満の場合や
+    リクエスト自体が失敗した場合、不足分は個別の query_model で補う。
+
+    Args:
+        model: OpenRouter model identifier
+        messages: List of message dicts with 'role' and 'content'
+        n: Number of completions to generate
+        system_prompt: Optional system prompt to prepend
+        timeout: Request timeout in seconds
+
+    Returns:
+        List of n response dicts (same shape as query_model), None for failures
+    """
+    start_time = time.time()
+
+    final_messages = []
+    if system_prompt:
+        final_messages.append({"role": "system", "content": system_prompt})
+    final_messages.extend(messages)
+
+    payload = {
+        "model": model,
+        "messages": final_messages,
+        "n": n,
+    }
+
+    results: List[Optional[Dict[str, Any]]] = [None] * n
+    try:
+        response = await _post_with_retry(orjson.dumps(payload), timeout)
+        data = orjson.loads(response.content)
+        choices = data.get('choices', [])[:n]
+        usage = data.get('usage', {})
+        response_time_ms = int((time.time() - start_time) * 1000)
 
+        for i, choice in enumerate(choices):
+            results[i] = _build_response(
+                choice['message'],
+                _split_usage(usage, len(choices), i),
+                model,
+                response_time_ms
+            )
     except Exception as e:
-        logger.error(f"Error querying model {model}: {e}")
-        return None
+        logger.error(f"Error querying model {model} with n={n}: {e}")
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        logger.info(f"{model}: n={n} returned {n - len(missing)} choices, querying {len(missing)} individually")
+        fallback = await asyncio.gather(*[
+            # 各メンバーに別々の回答が必要なので合流させない
+            query_model(model, messages, system_prompt=system_prompt, timeout=timeout, coalesce=False)
+            for _ in missing
+        ])
+        for i, r in zip(missing, fallback):
+            results[i] = r
+
+    return results
 
 
 async def query_model_with_tools(
@@ -112,17 +487,20 @@ async def query_model_with_tools(
 
     start_time = time.time()
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
     # Build messages with optional system prompt
     final_messages = []
     if system_prompt:
         final_messages.append({"role": "system", "content": system_prompt})
     final_messages.extend(messages)
 
+    # 各メッセージは一度だけシリアライズし、イテレーションごとにバイト列を連結する
+    # （増えていく履歴を毎回まるごと再シリアライズするO(N^2)のコストを避ける）
+    encoded_messages = [orjson.dumps(m) for m in final_messages]
+    model_json = orjson.dumps(model)
+    tools_json = b""
+    if tools:
+        tools_json = b',"tools":' + orjson.dumps(tools) + b',"tool_choice":' + orjson.dumps(tool_choice)
+
     # トークン使用量を累積
     total_usage = {
         'prompt_tokens': 0,
@@ -137,24 +515,11 @@ async def query_model_with_tools(
     local_tool_logger = tool_logger or ToolLogger()
 
     for iteration in range(max_tool_iterations):
-        payload = {
-            "model": model,
-            "messages": final_messages,
-        }
-
-        if tools:
-            payload["tools"] = tools
-            payload["tool_choice"] = tool_choice
+        body = _build_body(model_json, encoded_messages, tools_json)
 
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(
-                    OPENROUTER_API_URL,
-                    headers=headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                data = response.json()
+            response = await _post_with_retry(body, timeout)
+            data = orjson.loads(response.content)
 
             message = data['choices'][0]['message']
             usage = data.get('usage', {})
@@ -179,24 +544,37 @@ async def query_model_with_tools(
                 }
 
             # ツール呼び出しを実行
-            final_messages.append(message)  # assistant message with tool_calls
+            encoded_messages.append(orjson.dumps(message))  # assistant message with tool_calls
 
-            for tool_call in message['tool_calls']:
+            # 同一イテレーション内のツール呼び出しは互いに独立なので並行実行する
+            # （レイテンシは合計ではなく最も遅いツールの時間になる）
+            tool_calls = message['tool_calls']
+            parsed_calls = []
+            for tool_call in tool_calls:
                 tool_name = tool_call['function']['name']
-                try:
-                    arguments = json.loads(tool_call['function']['arguments'])
-                except json.JSONDecodeError:
-                    arguments = {}
-
+                arguments = _parse_args(tool_call['function'].get('arguments'))
                 logger.info(f"Tool call: {tool_name}({arguments})")
+                parsed_calls.append((tool_name, arguments))
+
+            results = await asyncio.gather(
+                *[
+                    execute_tool(tool_name, arguments, local_tool_logger)
+                    for tool_name, arguments in parsed_calls
+                ],
+                return_exceptions=True
+            )
 
-                result = await execute_tool(tool_name, arguments, local_tool_logger)
+            # toolメッセージは呼び出し順に追加する（APIの順序要件を維持）
+            for tool_call, (tool_name, arguments), result in zip(tool_calls, parsed_calls, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Tool {tool_name} raised: {result}")
+                    result = f"Error: {result}"
 
-                final_messages.append({
+                encoded_messages.append(orjson.dumps({
                     "role": "tool",
                     "tool_call_id": tool_call['id'],
                     "content": result
-                })
+                }))
 
                 tools_used.append({
                     "name": tool_name,
@@ -212,18 +590,9 @@ async def query_model_with_tools(
 
     try:
         # ツールを外して最終回答を強制
-        payload = {
-            "model": model,
-            "messages": final_messages,
-        }
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                OPENROUTER_API_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        body = _build_body(model_json, encoded_messages)
+        response = await _post_with_retry(body, timeout)
+        data = orjson.loads(response.content)
 
         message = data['choices'][0]['message']
         usage = data.get('usage', {})
@@ -275,50 +644,164 @@ async def query_models_parallel(
     return {model: response for model, response in zip(models, responses)}
 
 
+async def _single(coro) -> List[Optional[Dict[str, Any]]]:
+    """単一レスポンスのコルーチンを1要素リストを返すコルーチンに変換"""
+    return [await coro]
+
+
+async def _guarded(member_ids: List[str], coro) -> List[Optional[Dict[str, Any]]]:
+    """ジョブの例外をログに記録して None 埋めに変換（兄弟タスクを巻き込まない）"""
+    try:
+        return await coro
+    except Exception as e:
+        logger.error(f"Member query for {member_ids} raised: {e}")
+        return [None] * len(member_ids)
+
+
+async def _collect_until_quorum(
+    tasks: Dict["asyncio.Task", List[str]],
+    results: Dict[str, Optional[Dict[str, Any]]],
+    quorum_ratio: float,
+    soft_timeout_s: Optional[float]
+) -> None:
+    """クォーラム到達 / ソフトタイムアウトまで結果を集め、残りのタスクをキャンセルする"""
+    quorum = min(len(results), max(1, math.ceil(quorum_ratio * len(results))))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + soft_timeout_s if soft_timeout_s is not None else None
+
+    pending = set(tasks)
+    successes = 0
+    try:
+        while pending and successes < quorum:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                logger.warning(
+                    f"Soft timeout ({soft_timeout_s}s) reached with {successes}/{len(results)} responses"
+                )
+                break
+            for task in done:
+                for member_id, response in zip(tasks[task], task.result()):
+                    results[member_id] = response
+                    if response is not None:
+                        successes += 1
+    finally:
+        # 残りのタスク（遅いメンバー）をキャンセル
+        for task in pending:
+            task.cancel()
+
+    if pending:
+        logger.info(f"Cancelled {len(pending)} slower job(s) after quorum {successes}/{quorum}")
+
+
+async def _gather_with_quorum(
+    jobs: List[Tuple[List[str], Any]],
+    quorum_ratio: float = 1.0,
+    soft_timeout_s: Optional[float] = None
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    ジョブを並行実行し、クォーラム到達またはソフトタイムアウトで打ち切る
+
+    各ジョブは (member_idのリスト, 同じ長さのレスポンスリストを返すコルーチン)。
+    成功レスポンス（None以外）がメンバー総数の ceil(quorum_ratio * N) 件
+    集まった時点、または soft_timeout_s 秒経過した時点で未完了のジョブを
+    キャンセルする。キャンセルされた・失敗したメンバーは None になる。
+
+    Python 3.11+ では asyncio.TaskGroup で子タスクの寿命を構造化し、
+    呼び出し元がキャンセルされた場合も子タスクが確実にキャンセル・回収される。
+    3.10 では create_task + gather で同等の回収を行う。
+
+    Args:
+        jobs: (member_ids, coroutine) のリスト
+        quorum_ratio: 必要な成功レスポンスの割合 (0.0-1.0)
+        soft_timeout_s: 打ち切りまでの秒数（Noneなら無制限）
+
+    Returns:
+        Dict mapping member id to response dict (or None)
+    """
+    results: Dict[str, Optional[Dict[str, Any]]] = {
+        member_id: None for member_ids, _ in jobs for member_id in member_ids
+    }
+    if not jobs:
+        return results
+
+    if _HAS_TASK_GROUP:
+        async with asyncio.TaskGroup() as tg:
+            tasks = {
+                tg.create_task(_guarded(member_ids, coro)): member_ids
+                for member_ids, coro in jobs
+            }
+            await _collect_until_quorum(tasks, results, quorum_ratio, soft_timeout_s)
+    else:
+        tasks = {
+            asyncio.create_task(_guarded(member_ids, coro)): member_ids
+            for member_ids, coro in jobs
+        }
+        try:
+            await _collect_until_quorum(tasks, results, quorum_ratio, soft_timeout_s)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return results
+
+
 async def query_members_parallel(
     members: List[Dict[str, Any]],
     messages: List[Dict[str, str]],
     tools: List[Dict[str, Any]] = None,
-    tool_logger=None
+    tool_logger=None,
+    quorum_ratio: float = 1.0,
+    soft_timeout_s: Optional[float] = None
 ) -> Dict[str, Optional[Dict[str, Any]]]:
     """
     Query multiple council members in parallel.
 
+    Without tools, members sharing the same model and system prompt are
+    batched into a single request using the "n" parameter.
+
     Args:
         members: List of member dicts with 'id', 'model', 'system_prompt'
         messages: List of message dicts to send to each member
         tools: Optional list of tool definitions
         tool_logger: Optional ToolLogger for logging tool executions
+        quorum_ratio: Fraction of members whose successful responses are
+            enough to finish; slower members are cancelled (default: wait for all)
+        soft_timeout_s: Return partial results after this many seconds
 
     Returns:
-        Dict mapping member id to response dict (or None if failed)
+        Dict mapping member id to response dict (or None if failed/cancelled)
     """
+    jobs: List[Tuple[List[str], Any]] = []
+
     if tools:
-        # ツール有効な場合
-        tasks = [
-            query_model_with_tools(
+        # ツール有効な場合（メンバーごとにツールループが分岐するためバッチ化しない）
+        for member in members:
+            jobs.append(([member["id"]], _single(query_model_with_tools(
                 member["model"],
                 messages,
                 tools=tools,
                 system_prompt=member.get("system_prompt"),
                 tool_logger=tool_logger
-            )
-            for member in members
-        ]
+            ))))
     else:
-        # ツールなしの場合（従来通り）
-        tasks = [
-            query_model(
-                member["model"],
-                messages,
-                system_prompt=member.get("system_prompt")
-            )
-            for member in members
-        ]
-
-    responses = await asyncio.gather(*tasks)
-
-    return {
-        member["id"]: response
-        for member, response in zip(members, responses)
-    }
+        # ツールなしの場合: 同一 (model, system_prompt) のメンバーを1リクエストにまとめる
+        groups: Dict[Tuple[str, Optional[str]], List[str]] = {}
+        for member in members:
+            key = (member["model"], member.get("system_prompt"))
+            groups.setdefault(key, []).append(member["id"])
+
+        for (model, system_prompt), member_ids in groups.items():
+            if len(member_ids) > 1:
+                coro = query_model_n(model, messages, len(member_ids), system_prompt=system_prompt)
+            else:
+                coro = _single(query_model(model, messages, system_prompt=system_prompt))
+            jobs.append((member_ids, coro))
+
+    responses = await _gather_with_quorum(jobs, quorum_ratio, soft_timeout_s)
+
+    # メンバーの並び順を維持して返す
+    return {member["id"]: responses[member["id"]] for member in members}
@@ -1,31 +1,585 @@
 """Storage abstraction for conversations and configs (local JSON or GCS)."""
 
-import json
+import atexit
+import contextlib
+import copy
+import gzip
+import logging
+import mmap
 import os
 import shutil
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from pathlib import Path
 
+import orjson
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ijson  # optional: インデックス再構築時のストリーミングパース
+except ImportError:
+    ijson = None
+
 STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
 GCS_BUCKET = os.getenv("GCS_BUCKET")
 GCS_PREFIX = os.getenv("GCS_PREFIX", "")
 
 DATA_BASE_DIR = os.getenv("DATA_DIR", "data")
+# 1にすると書き込みごとにfsyncする（電源断にも耐えるが遅い）
+STORAGE_DURABLE = os.getenv("STORAGE_DURABLE") == "1"
+# "zstd" にするとローカルの会話ファイルを zstd 圧縮（.json.zst）で保存する（要zstandard）
+STORAGE_COMPRESS = os.getenv("STORAGE_COMPRESS", "").lower()
+ZSTD_LEVEL = 3
+ZSTD_SUFFIX = ".zst"
+# GCSは gzip しか展開配信（decompressive transcoding）に対応しないため、
+# STORAGE_COMPRESS 指定時のGCSの会話は Content-Encoding: gzip で保存する
+GCS_GZIP_LEVEL = 6
+# 0より大きいとローカルのサマリー・設定の書き込みをこのミリ秒数だけ遅らせ、
+# その間の更新を1回の書き込みにまとめる（終了時・flush()で書き出す。既定は即時書き込み）
+STORAGE_WRITE_DELAY_MS = int(os.getenv("STORAGE_WRITE_DELAY_MS", "0"))
+# 1にすると保存するJSONファイルをインデント付きで書く（デバッグ用。既定は無インデント）
+JSON_INDENT = os.getenv("JSON_INDENT") == "1"
+
+
+def _dumps(data: Any, indent: bool = False) -> bytes:
+    """
+    ストレージ用にJSONをシリアライズ（UTF-8バイト列）
+
+    ファイル全体を書く場合は indent=JSON_INDENT を渡す。
+    1行1レコードの追記ログは常に無インデントで書くこと。
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, option=option)
+
+
+_now_iso_cache: Tuple[int, str] = (-1, "")
+
+
+def _now_iso() -> str:
+    """
+    現在時刻（UTC）のISO文字列（datetime.utcnow().isoformat() と同じ形式）
+
+    同一リクエスト内で何度も呼ばれるため、秒までの部分だけを秒ごとに整形して使い回す
+    （作成日時で並べ替えるのでマイクロ秒の精度は保つ）
+    """
+    global _now_iso_cache
+    seconds, micros = divmod(time.time_ns() // 1000, 1_000_000)
+    cached_seconds, prefix = _now_iso_cache
+    if cached_seconds != seconds:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _now_iso_cache = (seconds, prefix)
+    return f"{prefix}.{micros:06d}" if micros else prefix
+
+
+def _zstd_dumps(data: Any) -> bytes:
+    """JSONをシリアライズしてzstd圧縮"""
+    import zstandard  # optional dependency
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(_dumps(data))
+
+
+def _zstd_loads(raw: bytes) -> Any:
+    """zstd圧縮されたJSONを展開してパース"""
+    import zstandard  # optional dependency
+    return orjson.loads(zstandard.ZstdDecompressor().decompress(raw))
 
 
 def _project_prefix(project_id: str) -> str:
     return os.path.join(DATA_BASE_DIR, "projects", project_id)
 
 
+# -------- パース済みJSONのキャッシュ（ローカルのみ） --------
+# 読み込みは書き込みより圧倒的に多いため、パース結果を (mtime_ns, size) 付きで保持し、
+# ファイルが変わっていなければ open() とパースを省略する
+PARSE_CACHE_MAX_ENTRIES = 256
+_parse_cache: "OrderedDict[str, Tuple[int, int, Any]]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+# これ以上のサイズのJSONはmmapしてパースする（read()によるコピーを省く。
+# 小さいファイルではmmapの準備の方が高くつくため通常のread()）
+MMAP_MIN_BYTES = 1024 * 1024
+
+
+def _load_mapped_json(path: str) -> Any:
+    """ファイルをmmapしてorjsonでパースする"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            return orjson.loads(view)
+
+
+def _cached_load_json(
+    path: str,
+    copy_result: bool = True,
+    parse: Callable[[bytes], Any] = orjson.loads
+) -> Any:
+    """
+    JSONファイルを読み込む（変更がなければキャッシュから返す）
+
+    呼び出し側が結果を書き換えてもキャッシュが壊れないよう、既定ではdeepcopyを返す。
+    読み取り専用で使う場合は copy_result=False でコピーを省略できる。
+    JSON Lines等の独自形式は parse にパース関数を渡す。
+
+    Raises:
+        FileNotFoundError: ファイルが存在しない
+        orjson.JSONDecodeError: JSONとして不正
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        with _parse_cache_lock:
+            _parse_cache.pop(path, None)
+        raise
+
+    with _parse_cache_lock:
+        hit = _parse_cache.get(path)
+        if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            _parse_cache.move_to_end(path)
+            data = hit[2]
+        else:
+            data = None
+
+    if data is None:
+        if parse is orjson.loads and st.st_size >= MMAP_MIN_BYTES:
+            data = _load_mapped_json(path)
+        else:
+            with open(path, 'rb') as f:
+                data = parse(f.read())
+        _remember_json(path, data, st)
+
+    return copy.deepcopy(data) if copy_result else data
+
+
+def _remember_json(path: str, data: Any, st: Optional[os.stat_result] = None):
+    """書き込み直後のデータをキャッシュに登録（次回の読み込みでパースを省略）"""
+    if st is None:
+        st = os.stat(path)
+        data = copy.deepcopy(data)
+    with _parse_cache_lock:
+        _parse_cache[path] = (st.st_mtime_ns, st.st_size, data)
+        _parse_cache.move_to_end(path)
+        while len(_parse_cache) > PARSE_CACHE_MAX_ENTRIES:
+            _parse_cache.popitem(last=False)
+
+
+def _clear_cache():
+    """パース済みJSONのキャッシュを空にする（テストの後始末用）"""
+    with _parse_cache_lock:
+        _parse_cache.clear()
+
+
+# -------- アトミックな書き込み（ローカルのみ） --------
+# パスごとのロック（書き込みとキャッシュ登録の順序を揃える）
+# 使用中（誰かが参照している間）だけ保持し、触れたパスの数だけロックが溜まり続けないようにする
+_path_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_path_locks_lock = threading.Lock()
+
+
+def _path_lock(path: str) -> threading.Lock:
+    with _path_locks_lock:
+        lock = _path_locks.get(path)
+        if lock is None:
+            lock = _path_locks[path] = threading.Lock()
+        return lock
+
+
+def _unchanged_on_disk(path: str, data: Any) -> bool:
+    """ファイルが最後に読み書きした内容のままで、それが data と等しいか"""
+    with _parse_cache_lock:
+        hit = _parse_cache.get(path)
+    if hit is None or hit[2] != data:
+        return False
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return hit[0] == st.st_mtime_ns and hit[1] == st.st_size
+
+
+def _atomic_write_json(
+    path: str,
+    data: Any,
+    indent: bool = False,
+    content: Optional[bytes] = None,
+    skip_unchanged: bool = True,
+    copy_to_cache: bool = True
+):
+    """
+    一時ファイルに書いてから os.replace で置き換える
+
+    書き込み途中で落ちても元のファイルは壊れない。同じパスへの同時書き込みは
+    直列化し、キャッシュに最後に書いた内容が残るようにする。
+    読み込み直後の再保存など、内容が変わらない書き込みは省略する。
+
+    Args:
+        data: キャッシュに登録するデータ
+        content: 書き込むバイト列（省略時は data をシリアライズ）
+        skip_unchanged: data がファイルの内容と等しければ書き込まない
+            （data がファイルのパース結果そのものでない場合はFalseにする）
+        copy_to_cache: Falseなら data をコピーせずにキャッシュに登録する
+            （呼び出し側が以後 data を書き換えない場合に限る）
+    """
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with _path_lock(path):
+        if skip_unchanged and _unchanged_on_disk(path, data):
+            return
+        if content is None:
+            content = _dumps(data, indent=indent or JSON_INDENT)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+                if STORAGE_DURABLE:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        if copy_to_cache:
+            _remember_json(path, data)
+        else:
+            _remember_json(path, data, os.stat(path))
+
+
+def _prepare_memory_entry(entry: Dict[str, Any], now: str):
+    """IDと抽出日時がなければ付与する"""
+    if "id" not in entry:
+        entry["id"] = f"mem_{uuid.uuid4().hex[:12]}"
+    if "extracted_at" not in entry:
+        entry["extracted_at"] = now
+
+
+# -------- メモリの追記ログ（ローカルのみ） --------
+# memory.jsonl は1行目がヘッダー、以降が操作ログ:
+#   {"op": "add", "entry": {...}, "at": ...}
+#   {"op": "upd", "id": ..., "patch": {...}, "at": ...}
+#   {"op": "del", "id": ..., "at": ...}
+# エントリの追加・更新・削除は1行の追記で済ませ、読み込み時に畳み込む。
+# 更新・削除の行がエントリ数の半分を超えたら全体を書き直して圧縮する。
+MEMORY_LOG_VERSION = 1
+_memory_lock = threading.Lock()
+
+
+def _fold_memory_log(raw: bytes) -> Dict[str, Any]:
+    """
+    追記ログを畳み込んでメモリを復元
+
+    Returns:
+        _memory_log_state() の形式
+    """
+    lines = raw.splitlines()
+    header = orjson.loads(lines[0])
+    entries: Dict[str, Dict[str, Any]] = {}
+    updated_at = header.get("updated_at", header["created_at"])
+    tombstones = 0
+    for line in lines[1:]:
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # 書き込み途中で落ちた末尾行などは無視する
+            continue
+        op = record.get("op")
+        if op == "add":
+            entries[record["entry"]["id"]] = record["entry"]
+        elif op == "upd" and record["id"] in entries:
+            entries[record["id"]].update(record["patch"])
+            tombstones += 1
+        elif op == "del":
+            entries.pop(record["id"], None)
+            tombstones += 1
+        updated_at = record.get("at", updated_at)
+    memory = {
+        "version": header.get("version", MEMORY_LOG_VERSION),
+        "created_at": header["created_at"],
+        "updated_at": updated_at,
+        "entries": list(entries.values())
+    }
+    return _memory_log_state(memory, tombstones)
+
+
+def _memory_log_state(memory: Dict[str, Any], tombstones: int = 0) -> Dict[str, Any]:
+    """
+    追記ログの状態（キャッシュに載せる形）を作る
+
+    Returns:
+        {"memory": メモリdict, "tombstones": 更新・削除の行数,
+         "positions": エントリID → entries内の位置}
+    """
+    positions = {entry["id"]: i for i, entry in enumerate(memory["entries"])}
+    return {"memory": memory, "tombstones": tombstones, "positions": positions}
+
+
+def _push_summary(entries: List[Dict[str, Any]], summary: Dict[str, Any], max_entries: int) -> List[Dict[str, Any]]:
+    """
+    サマリーを先頭に追加し、同じ会話の古いサマリーと max_entries 超過分を除く
+
+    先頭への挿入と末尾の切り詰めを固定長dequeで行い、残す分だけを走査する
+    """
+    others = (s for s in entries if s.get("conversation_id") != summary.get("conversation_id"))
+    pushed = deque(islice(others, max(max_entries - 1, 0)), maxlen=max_entries)
+    pushed.appendleft(summary)  # 新しいものを先頭に
+    return list(pushed)
+
+
+def _merge_summaries(summaries: Dict[str, Any], new_summaries: List[Dict[str, Any]], max_entries: int) -> bool:
+    """
+    サマリーを順に追加する（summariesを書き換える）
+
+    同じ会話のサマリーがあり、そのメッセージ数が新しいもの以上なら追加しない。
+
+    Returns:
+        1件でも追加されたらTrue
+    """
+    now = _now_iso()
+    entries = summaries.get("entries", [])
+    changed = False
+    for summary in new_summaries:
+        if "summarized_at" not in summary:
+            summary["summarized_at"] = now
+        existing = next(
+            (s for s in entries if s.get("conversation_id") == summary.get("conversation_id")),
+            None
+        )
+        if existing and existing.get("message_count", 0) >= summary.get("message_count", 0):
+            continue
+        entries = _push_summary(entries, summary, max_entries)
+        changed = True
+    summaries["entries"] = entries
+    return changed
+
+
+# -------- ファイル読み込み用スレッドプール --------
+# 一覧取得時の多数のファイル/Blob読み込みはI/O待ちが支配的なため並行して行う
+# （上限を設けてファイルディスクリプタや接続の枯渇を防ぐ）
+LOCAL_IO_WORKERS = 16
+GCS_IO_WORKERS = 32
+# GCSのHTTP接続プール上限（並行ダウンロード分に加え、リクエスト処理スレッドからの同時アクセス分の余裕を持たせる）
+GCS_HTTP_POOL_SIZE = 64
+# GCSのバッチリクエスト1回あたりの上限件数
+GCS_BATCH_SIZE = 100
+# GCSの世代一致を条件にした書き込みが他の書き込みと競合した場合の再試行回数
+GCS_PRECONDITION_MAX_RETRIES = 5
+_io_pool = ThreadPoolExecutor(max_workers=LOCAL_IO_WORKERS, thread_name_prefix="storage-io")
+_gcs_pool = ThreadPoolExecutor(max_workers=GCS_IO_WORKERS, thread_name_prefix="storage-gcs")
+
+
+# -------- 会話一覧インデックス --------
+CONVERSATION_INDEX_FILENAME = "_index.json"
+CONVERSATION_INDEX_VERSION = 1
+
+
+def _index_record(conversation: Dict[str, Any]) -> Dict[str, Any]:
+    """会話から一覧用のメタデータを取り出す"""
+    return {
+        "id": conversation["id"],
+        "created_at": conversation["created_at"],
+        "title": conversation.get("title", "New Conversation"),
+        "message_count": len(conversation["messages"])
+    }
+
+
+def _sorted_index(records: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """インデックスを一覧表示用に作成日時の新しい順に並べる"""
+    return sorted(records.values(), key=lambda x: x["created_at"], reverse=True)
+
+
+# これ以上のサイズの会話はインデックス再構築時にijsonでストリーミングパースする。
+# ijsonはorjsonで全体をパースするより数倍遅いが、ピークメモリは数十分の一で済む
+# （600KBの会話で orjson 0.45ms/4.9MB, ijson 1.7ms/0.15MB）。
+# スレッドプールで並行して読むため、巨大な会話だけはメモリを優先する
+STREAM_PARSE_MIN_BYTES = 8 * 1024 * 1024
+_MESSAGE_ITEM_EVENTS = {"start_map", "start_array", "string", "number", "boolean", "null"}
+
+
+def _read_conversation_meta(path: str) -> Dict[str, Any]:
+    """
+    会話ファイルから一覧用のメタデータだけをストリーミングで読み出す（要ijson）
+
+    messages 配列はオブジェクトを組み立てずに件数だけ数えるため、
+    会話の長さによらずメモリ使用量がほぼ一定になる
+    """
+    meta = {"title": "New Conversation", "message_count": 0}
+    with open(path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f):
+            if prefix == "messages.item":
+                if event in _MESSAGE_ITEM_EVENTS:
+                    meta["message_count"] += 1
+            elif prefix in ("id", "created_at", "title") and event == "string":
+                meta[prefix] = value
+            elif prefix == "log_seq" and event == "number":
+                meta["log_seq"] = int(value)
+    return {
+        "id": meta["id"],
+        "created_at": meta["created_at"],
+        "title": meta["title"],
+        "message_count": meta["message_count"],
+        "log_seq": meta.get("log_seq", 0)
+    }
+
+
+# -------- 会話の追記ログ（ローカルのみ） --------
+# 会話本体（<id>.json）とは別に、追加メッセージとタイトル変更を <id>.log.jsonl に追記する:
+#   {"seq": n, "op": "msg", "message": {...}}
+#   {"seq": n, "op": "title", "title": "..."}
+# 本体には反映済みの最終seqを "log_seq" として保存し、読み込み時はそれより後の
+# レコードだけを適用する（本体の書き直し後にログ削除前に落ちても二重適用しない）。
+# ログのサイズが本体を超えたら本体に畳み込む（追記あたりの書き込み量を償却O(1)に保つ）。
+CONVERSATION_LOG_SUFFIX = ".log.jsonl"
+
+
+def _parse_conversation_log(raw: bytes) -> List[Dict[str, Any]]:
+    """会話の追記ログをパース（書き込み途中で途切れた行は無視）"""
+    records = []
+    for line in raw.splitlines():
+        try:
+            records.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            continue
+    return records
+
+
+def _apply_conversation_log(conversation: Dict[str, Any], records: List[Dict[str, Any]]) -> int:
+    """
+    追記ログを会話に適用する（conversationを書き換える）
+
+    Returns:
+        適用後の最終seq
+    """
+    last_seq = conversation.pop("log_seq", 0)
+    for record in records:
+        if record["seq"] <= last_seq:
+            continue
+        if record["op"] == "msg":
+            conversation["messages"].append(record["message"])
+        elif record["op"] == "title":
+            conversation["title"] = record["title"]
+        last_seq = record["seq"]
+    return last_seq
+
+
+def _apply_log_to_index_record(record: Dict[str, Any], log_seq: int, records: List[Dict[str, Any]]) -> int:
+    """追記ログを一覧用メタデータに適用する（メッセージ本体はコピーしない）"""
+    for log_record in records:
+        if log_record["seq"] <= log_seq:
+            continue
+        if log_record["op"] == "msg":
+            record["message_count"] += 1
+        elif log_record["op"] == "title":
+            record["title"] = log_record["title"]
+        log_seq = log_record["seq"]
+    return log_seq
+
+
 # -------- Local backend --------
 class LocalStorage:
     def __init__(self):
         self.base_dir = DATA_BASE_DIR
         self.base_project_dir = os.path.join(self.base_dir, "projects")
+        # 削除中のプロジェクトの退避先（一覧に出ないよう projects の外に置く）
+        self.deleting_dir = os.path.join(self.base_dir, ".deleting")
+        # 作成済みのディレクトリ（保存のたびにmkdirのシステムコールを発行しないよう覚えておく）
+        self._ensured_dirs = set()
+        # 書き込み待ちのデータ（パス -> データ）と、まとめて書き出すタイマー
+        self._dirty: Dict[str, Any] = {}
+        self._dirty_lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
+        # batch() 中のプロジェクト（スレッドごと。プロジェクトID -> ネストの深さ）
+        self._batch_local = threading.local()
+        # 前回のプロセスが削除しきれなかった退避ディレクトリを片付ける
+        try:
+            with os.scandir(self.deleting_dir) as it:
+                for entry in it:
+                    self._remove_in_background(entry.path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _remove_in_background(path: str):
+        threading.Thread(target=shutil.rmtree, args=(path, True), daemon=True).start()
 
     def _ensure_dir(self, path: str):
+        if path in self._ensured_dirs:
+            return
         Path(path).mkdir(parents=True, exist_ok=True)
+        self._ensured_dirs.add(path)
+
+    def _forget_dirs(self, path: str):
+        """削除したディレクトリ（とその配下）を作成済みの記録から外す"""
+        prefix = path + os.sep
+        self._ensured_dirs = {d for d in self._ensured_dirs if d != path and not d.startswith(prefix)}
+
+    def _load_json(self, path: str) -> Any:
+        """書き込み待ちのデータがあればそれを、なければファイルを読む"""
+        with self._dirty_lock:
+            if path in self._dirty:
+                return copy.deepcopy(self._dirty[path])
+        return _cached_load_json(path)
+
+    def _batching(self) -> Dict[str, int]:
+        depths = getattr(self._batch_local, "depths", None)
+        if depths is None:
+            depths = self._batch_local.depths = {}
+        return depths
+
+    @contextlib.contextmanager
+    def batch(self, project_id: str):
+        """ブロック内のサマリー・設定の書き込みを溜め、抜けるときに1回だけ書き出す"""
+        depths = self._batching()
+        depths[project_id] = depths.get(project_id, 0) + 1
+        try:
+            yield
+        finally:
+            depths[project_id] -= 1
+            if not depths[project_id]:
+                del depths[project_id]
+                self.flush(project_id)
+
+    def _save_json(self, project_id: str, path: str, data: Any):
+        """JSONを保存（STORAGE_WRITE_DELAY_MS 指定時や batch() 中は遅らせて直近の内容だけを書く）"""
+        batching = project_id in self._batching()
+        with self._dirty_lock:
+            # 他のスレッドの batch() で書き込み待ちのパスは、直接書くと書き出し時に
+            # 古い内容で上書きされるため、待ちの内容の方を更新する
+            if STORAGE_WRITE_DELAY_MS <= 0 and not batching and path not in self._dirty:
+                _atomic_write_json(path, data)
+                return
+            self._dirty[path] = copy.deepcopy(data)
+            if STORAGE_WRITE_DELAY_MS > 0 and self._flush_timer is None:
+                self._flush_timer = threading.Timer(STORAGE_WRITE_DELAY_MS / 1000, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self, project_id: Optional[str] = None):
+        """書き込み待ちのデータ（project_id 指定時はそのプロジェクトの分）をファイルに書き出す"""
+        # 書き出し中に読まれても古い内容を返さないよう、書き終えるまでロックを保持する
+        with self._dirty_lock:
+            paths = list(self._dirty)
+            if project_id is not None:
+                prefix = os.path.join(self.base_project_dir, project_id) + os.sep
+                paths = [p for p in paths if p.startswith(prefix)]
+            for path in paths:
+                self._ensure_dir(os.path.dirname(path))
+                _atomic_write_json(path, self._dirty[path])
+                del self._dirty[path]
+            if not self._dirty and self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+    def _discard_pending(self, path: str):
+        """削除したディレクトリ配下の書き込み待ちを捨てる（書き出しで復活させない）"""
+        prefix = path + os.sep
+        with self._dirty_lock:
+            for pending in [p for p in self._dirty if p.startswith(prefix)]:
+                del self._dirty[pending]
 
     def _conv_dir(self, project_id: str) -> str:
         return os.path.join(self.base_dir, "projects", project_id, "conversations")
@@ -33,10 +587,131 @@ class LocalStorage:
     def _conv_path(self, project_id: str, conversation_id: str) -> str:
         return os.path.join(self._conv_dir(project_id), f"{conversation_id}.json")
 
+    def _conv_paths(self, project_id: str, conversation_id: str) -> List[str]:
+        """
+        会話ファイルの候補パス（現在の保存形式を先頭に）
+
+        STORAGE_COMPRESS を切り替えても既存の会話を読めるよう、両方の形式を探す
+        """
+        path = self._conv_path(project_id, conversation_id)
+        if STORAGE_COMPRESS == "zstd":
+            return [path + ZSTD_SUFFIX, path]
+        return [path, path + ZSTD_SUFFIX]
+
+    def _conv_log_path(self, project_id: str, conversation_id: str) -> str:
+        return os.path.join(self._conv_dir(project_id), f"{conversation_id}{CONVERSATION_LOG_SUFFIX}")
+
+    def _conv_lock(self, project_id: str, conversation_id: str) -> threading.Lock:
+        """会話単位のロック（本体とログの更新を直列化）"""
+        return _path_lock(self._conv_path(project_id, conversation_id) + "#conversation")
+
+    def _load_conversation_parts(
+        self,
+        project_id: str,
+        conversation_id: str,
+        copy_result: bool = True
+    ) -> Optional[Tuple[str, Dict[str, Any], List[Dict[str, Any]]]]:
+        """会話本体と追記ログを読み込む（本体がなければNone）"""
+        for path in self._conv_paths(project_id, conversation_id):
+            parse = _zstd_loads if path.endswith(ZSTD_SUFFIX) else orjson.loads
+            try:
+                snapshot = _cached_load_json(path, copy_result=copy_result, parse=parse)
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            return None
+        try:
+            records = _cached_load_json(
+                self._conv_log_path(project_id, conversation_id),
+                copy_result=copy_result,
+                parse=_parse_conversation_log
+            )
+        except FileNotFoundError:
+            records = []
+        return path, snapshot, records
+
+    def _write_conversation(self, project_id: str, conversation: Dict[str, Any], log_seq: int = 0):
+        """
+        会話本体を現在の保存形式で書き込み、追記ログと旧形式のファイルを消す
+
+        呼び出し側で会話ロックを取得しておくこと。
+        """
+        self._ensure_dir(self._conv_dir(project_id))
+        path, other_path = self._conv_paths(project_id, conversation['id'])
+        stored = {**conversation, "log_seq": log_seq}
+        if path.endswith(ZSTD_SUFFIX):
+            _atomic_write_json(path, stored, content=_zstd_dumps(stored))
+        else:
+            _atomic_write_json(path, stored)
+        for stale_path in (self._conv_log_path(project_id, conversation['id']), other_path):
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                pass
+        self._update_index(project_id, conversation=conversation)
+
+    def _append_conversation_log(
+        self,
+        project_id: str,
+        conversation_id: str,
+        op: str,
+        **fields: Any
+    ) -> bool:
+        """
+        会話の追記ログに1レコード追記する（会話が存在しなければFalse）
+
+        本体は書き直さず、一覧インデックスだけを更新する。
+        ログが本体より大きくなったら本体に畳み込む。
+        """
+        log_path = self._conv_log_path(project_id, conversation_id)
+        with self._conv_lock(project_id, conversation_id):
+            parts = self._load_conversation_parts(project_id, conversation_id, copy_result=False)
+            if parts is None:
+                return False
+            snapshot_path, snapshot, records = parts
+
+            index_record = _index_record(snapshot)
+            last_seq = _apply_log_to_index_record(index_record, snapshot.get("log_seq", 0), records)
+            record = {"seq": last_seq + 1, "op": op, **fields}
+            _apply_log_to_index_record(index_record, last_seq, [record])
+
+            with _path_lock(log_path):
+                # 改行を先頭に付けて追記する（末尾行が途中で途切れていても次の行を壊さない）
+                with open(log_path, 'ab') as f:
+                    f.write(b"\n" + _dumps(record))
+                    if STORAGE_DURABLE:
+                        f.flush()
+                        os.fsync(f.fileno())
+                # 既存のレコードはキャッシュが持つもの（copy_result=False）なので共有し、
+                # 呼び出し側のデータを含む新しいレコードだけをコピーする（追記のコストをログ長に比例させない）
+                records = records + [copy.deepcopy(record)]
+                log_st = os.stat(log_path)
+                _remember_json(log_path, records, log_st)
+
+            if log_st.st_size > os.path.getsize(snapshot_path):
+                conversation = copy.deepcopy(snapshot)
+                log_seq = _apply_conversation_log(conversation, records)
+                self._write_conversation(project_id, conversation, log_seq)
+            else:
+                self._update_index(project_id, record=index_record)
+        return True
+
+    def append_message(self, project_id: str, conversation_id: str, message: Dict[str, Any]) -> bool:
+        """会話にメッセージを追記（会話が存在しなければFalse）"""
+        return self._append_conversation_log(project_id, conversation_id, "msg", message=message)
+
+    def set_conversation_title(self, project_id: str, conversation_id: str, title: str) -> bool:
+        """会話タイトルを変更（会話が存在しなければFalse）"""
+        return self._append_conversation_log(project_id, conversation_id, "title", title=title)
+
     def _config_path(self, project_id: str) -> str:
         return os.path.join(self.base_dir, "projects", project_id, "config.json")
 
     def _memory_path(self, project_id: str) -> str:
+        return os.path.join(self.base_dir, "projects", project_id, "memory.jsonl")
+
+    def _legacy_memory_path(self, project_id: str) -> str:
         return os.path.join(self.base_dir, "projects", project_id, "memory.json")
 
     def _summaries_path(self, project_id: str) -> str:
@@ -44,15 +719,35 @@ class LocalStorage:
 
     def list_projects(self) -> List[str]:
         Path(self.base_project_dir).mkdir(parents=True, exist_ok=True)
-        projects = [d for d in os.listdir(self.base_project_dir) if os.path.isdir(os.path.join(self.base_project_dir, d))]
+        # scandirはディレクトリ読み込み時に種別も得られるため、エントリごとのstatが不要
+        with os.scandir(self.base_project_dir) as it:
+            projects = [e.name for e in it if e.is_dir()]
         if not projects:
             projects.append("default")
         return sorted(set(projects))
 
     def delete_project(self, project_id: str):
+        """
+        プロジェクトを削除
+
+        ディレクトリを退避先にリネームした時点で削除済みとして返し、
+        中身の削除はバックグラウンドで行う（会話数が多くても待たせない）
+        """
         path = os.path.join(self.base_project_dir, project_id)
-        if os.path.isdir(path):
+        self._discard_pending(path)
+        staging = os.path.join(self.deleting_dir, f"{project_id}.{uuid.uuid4().hex}")
+        self._ensure_dir(self.deleting_dir)
+        try:
+            os.rename(path, staging)
+        except FileNotFoundError:
+            return
+        except OSError:
+            # リネームできない場合はその場で削除する
             shutil.rmtree(path, ignore_errors=True)
+            self._forget_dirs(path)
+            return
+        self._forget_dirs(path)
+        self._remove_in_background(staging)
 
     def create_project(self, project_id: str) -> Dict[str, str]:
         path = os.path.join(self.base_project_dir, project_id)
@@ -62,64 +757,156 @@ class LocalStorage:
 
     # Conversations
     def create_conversation(self, project_id: str, conversation_id: str) -> Dict[str, Any]:
-        self._ensure_dir(self._conv_dir(project_id))
         conversation = {
             "id": conversation_id,
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": _now_iso(),
             "title": "New Conversation",
             "messages": []
         }
-        with open(self._conv_path(project_id, conversation_id), 'w') as f:
-            json.dump(conversation, f, indent=2)
+        with self._conv_lock(project_id, conversation_id):
+            self._write_conversation(project_id, conversation)
         return conversation
 
     def get_conversation(self, project_id: str, conversation_id: str) -> Optional[Dict[str, Any]]:
-        path = self._conv_path(project_id, conversation_id)
-        if not os.path.exists(path):
+        parts = self._load_conversation_parts(project_id, conversation_id)
+        if parts is None:
             return None
-        with open(path, 'r') as f:
-            return json.load(f)
+        _, conversation, records = parts
+        _apply_conversation_log(conversation, records)
+        return conversation
 
     def save_conversation(self, project_id: str, conversation: Dict[str, Any]):
-        self._ensure_dir(self._conv_dir(project_id))
-        with open(self._conv_path(project_id, conversation['id']), 'w') as f:
-            json.dump(conversation, f, indent=2)
+        with self._conv_lock(project_id, conversation['id']):
+            # 既存のログは保存内容に含まれているものとして、最終seqを引き継いで破棄する
+            parts = self._load_conversation_parts(project_id, conversation['id'], copy_result=False)
+            log_seq = 0
+            if parts is not None:
+                _, snapshot, records = parts
+                log_seq = max([snapshot.get("log_seq", 0)] + [r["seq"] for r in records])
+            self._write_conversation(project_id, conversation, log_seq)
 
     def list_conversations(self, project_id: str) -> List[Dict[str, Any]]:
+        records = self._load_index(project_id)
+        if records is None:
+            # インデックスがない（旧データ・破損）場合は全件スキャンして作り直す
+            with self._index_lock(project_id):
+                records = self._scan_conversations(project_id)
+                self._write_index(project_id, records)
+        return _sorted_index(records)
+
+    # 会話一覧インデックス（一覧表示に必要なメタデータだけを1ファイルに集約）
+    def _index_path(self, project_id: str) -> str:
+        return os.path.join(self._conv_dir(project_id), CONVERSATION_INDEX_FILENAME)
+
+    def _index_lock(self, project_id: str) -> threading.Lock:
+        """プロジェクト単位のロック（インデックスの読み込み→更新→書き込みを直列化）"""
+        return _path_lock(self._index_path(project_id) + "#index")
+
+    def _load_index(self, project_id: str, copy_result: bool = True) -> Optional[Dict[str, Dict[str, Any]]]:
+        """インデックスを読み込む（存在しない・形式が違う場合はNone）"""
+        try:
+            index = _cached_load_json(self._index_path(project_id), copy_result=copy_result)
+        except (orjson.JSONDecodeError, IOError):
+            return None
+        if not isinstance(index, dict) or index.get("version") != CONVERSATION_INDEX_VERSION:
+            return None
+        return index["conversations"]
+
+    def _write_index(self, project_id: str, records: Dict[str, Dict[str, Any]], copy_to_cache: bool = True):
+        """インデックスを書き込む"""
+        path = self._index_path(project_id)
+        self._ensure_dir(os.path.dirname(path))
+        index = {"version": CONVERSATION_INDEX_VERSION, "conversations": records}
+        _atomic_write_json(path, index, skip_unchanged=copy_to_cache, copy_to_cache=copy_to_cache)
+
+    def _scan_conversations(self, project_id: str) -> Dict[str, Dict[str, Any]]:
+        """会話ファイルを全件読み込んでインデックスを組み立てる"""
         dir_path = self._conv_dir(project_id)
         self._ensure_dir(dir_path)
-        conversations = []
-        for filename in os.listdir(dir_path):
-            if filename.endswith('.json'):
-                path = os.path.join(dir_path, filename)
-                with open(path, 'r') as f:
-                    data = json.load(f)
-                    conversations.append({
-                        "id": data["id"],
-                        "created_at": data["created_at"],
-                        "title": data.get("title", "New Conversation"),
-                        "message_count": len(data["messages"])
-                    })
-        conversations.sort(key=lambda x: x["created_at"], reverse=True)
-        return conversations
+        with os.scandir(dir_path) as it:
+            paths = [
+                e.path for e in it
+                if e.name.endswith(('.json', '.json' + ZSTD_SUFFIX))
+                and e.name != CONVERSATION_INDEX_FILENAME and e.is_file()
+            ]
+
+        def read_one(path: str) -> Dict[str, Any]:
+            if path.endswith(ZSTD_SUFFIX):
+                data = _cached_load_json(path, copy_result=False, parse=_zstd_loads)
+                record, log_seq = _index_record(data), data.get("log_seq", 0)
+            elif ijson is not None and os.path.getsize(path) >= STREAM_PARSE_MIN_BYTES:
+                record = _read_conversation_meta(path)
+                log_seq = record.pop("log_seq")
+            else:
+                # 一覧はメタデータを読むだけなのでコピー不要
+                data = _cached_load_json(path, copy_result=False)
+                record, log_seq = _index_record(data), data.get("log_seq", 0)
+            try:
+                log_records = _cached_load_json(
+                    self._conv_log_path(project_id, record["id"]),
+                    copy_result=False,
+                    parse=_parse_conversation_log
+                )
+            except FileNotFoundError:
+                log_records = []
+            _apply_log_to_index_record(record, log_seq, log_records)
+            return record
+
+        return {record["id"]: record for record in _io_pool.map(read_one, paths)}
+
+    def _update_index(
+        self,
+        project_id: str,
+        conversation: Optional[Dict[str, Any]] = None,
+        removed_id: Optional[str] = None,
+        record: Optional[Dict[str, Any]] = None
+    ):
+        """会話の作成・保存・削除をインデックスに反映（record指定時はそのまま登録）"""
+        if conversation is not None:
+            record = _index_record(conversation)
+        with self._index_lock(project_id):
+            # キャッシュ上のインデックスはコピーせずに読み、変更する場合は外側のdictだけを作り直す
+            # （各会話のレコードは置き換えるだけで書き換えないため共有してよい）
+            records = self._load_index(project_id, copy_result=False)
+            if records is None:
+                # スキャンには保存・削除済みの状態が反映される
+                self._write_index(project_id, self._scan_conversations(project_id))
+                return
+            if record is not None:
+                if records.get(record["id"]) == record:
+                    return  # 一覧に出す項目が変わっていなければ書き直さない
+                records = {**records, record["id"]: record}
+            elif removed_id is not None:
+                if removed_id not in records:
+                    return
+                records = {k: v for k, v in records.items() if k != removed_id}
+            self._write_index(project_id, records, copy_to_cache=False)
 
     def delete_conversation(self, project_id: str, conversation_id: str) -> bool:
         """会話を削除"""
-        path = self._conv_path(project_id, conversation_id)
-        if os.path.exists(path):
-            os.remove(path)
-            return True
-        return False
+        removed = False
+        with self._conv_lock(project_id, conversation_id):
+            for path in self._conv_paths(project_id, conversation_id):
+                try:
+                    os.remove(path)
+                    removed = True
+                except FileNotFoundError:
+                    pass
+            try:
+                os.remove(self._conv_log_path(project_id, conversation_id))
+            except FileNotFoundError:
+                pass
+        if removed:
+            self._update_index(project_id, removed_id=conversation_id)
+        return removed
 
     # Config
     def get_config(self, project_id: str, default_config: Dict[str, Any]) -> Dict[str, Any]:
         path = self._config_path(project_id)
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
+        try:
+            return self._load_json(path)
+        except (orjson.JSONDecodeError, IOError):
+            pass
 
         self._ensure_dir(os.path.dirname(path))
         return default_config.copy()
@@ -127,68 +914,142 @@ class LocalStorage:
     def save_config(self, project_id: str, config: Dict[str, Any]):
         path = self._config_path(project_id)
         self._ensure_dir(os.path.dirname(path))
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        self._save_json(project_id, path, config)
 
     # ========== メモリ操作 ==========
 
+    def _load_memory_log(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """追記ログを読み込む（なければ旧形式のmemory.jsonを変換、どちらもなければNone）"""
+        try:
+            return _cached_load_json(self._memory_path(project_id), parse=_fold_memory_log)
+        except (orjson.JSONDecodeError, IndexError, KeyError, IOError):
+            pass
+        try:
+            memory = _cached_load_json(self._legacy_memory_path(project_id))
+        except (orjson.JSONDecodeError, IOError):
+            return None
+        return _memory_log_state(memory)
+
+    def _write_memory_log(self, project_id: str, memory: Dict[str, Any]):
+        """メモリ全体を圧縮済みの追記ログとして書き直す"""
+        path = self._memory_path(project_id)
+        self._ensure_dir(os.path.dirname(path))
+        header = {
+            "op": "header",
+            "version": MEMORY_LOG_VERSION,
+            "created_at": memory["created_at"],
+            "updated_at": memory["updated_at"]
+        }
+        lines = [_dumps(header)]
+        lines.extend(_dumps({"op": "add", "entry": entry}) for entry in memory["entries"])
+        # パース結果（畳み込んだ状態）が同じでもログの圧縮は行いたいので常に書き込む
+        _atomic_write_json(path, _memory_log_state(memory), content=b"\n".join(lines), skip_unchanged=False)
+        # 旧形式のファイルは移行が済んだら消す
+        try:
+            os.remove(self._legacy_memory_path(project_id))
+        except FileNotFoundError:
+            pass
+
+    def _append_memory_log(self, project_id: str, records: List[Dict[str, Any]], log: Dict[str, Any]):
+        """
+        操作を追記する（logは追記後の状態に更新済みのもの）
+
+        追記ログがまだない場合は先に現在の状態で作成してから追記する。
+        """
+        path = self._memory_path(project_id)
+        if not os.path.exists(path):
+            self._write_memory_log(project_id, log["memory"])
+            return
+        if log["tombstones"] > len(log["memory"]["entries"]) / 2:
+            self._write_memory_log(project_id, log["memory"])
+            return
+        with _path_lock(path):
+            # 改行を先頭に付けて追記する（末尾行が途中で途切れていても次の行を壊さない）
+            with open(path, 'ab') as f:
+                f.write(b"".join(b"\n" + _dumps(record) for record in records))
+                if STORAGE_DURABLE:
+                    f.flush()
+                    os.fsync(f.fileno())
+            _remember_json(path, log)
+
     def get_memory(self, project_id: str) -> Dict[str, Any]:
         """ユーザーメモリを取得"""
-        path = self._memory_path(project_id)
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
+        log = self._load_memory_log(project_id)
+        if log is not None:
+            return log["memory"]
         # デフォルトの空メモリ
+        now = _now_iso()
         return {
             "version": 1,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
+            "created_at": now,
+            "updated_at": now,
             "entries": []
         }
 
     def save_memory(self, project_id: str, memory: Dict[str, Any]):
         """ユーザーメモリを保存"""
-        path = self._memory_path(project_id)
-        self._ensure_dir(os.path.dirname(path))
-        memory["updated_at"] = datetime.utcnow().isoformat()
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(memory, f, indent=2, ensure_ascii=False)
+        memory["updated_at"] = _now_iso()
+        with _memory_lock:
+            self._write_memory_log(project_id, memory)
 
     def add_memory_entry(self, project_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
-        """メモリエントリを追加"""
-        memory = self.get_memory(project_id)
-        # IDがなければ生成
-        if "id" not in entry:
-            import uuid
-            entry["id"] = f"mem_{uuid.uuid4().hex[:12]}"
-        if "extracted_at" not in entry:
-            entry["extracted_at"] = datetime.utcnow().isoformat()
-        memory["entries"].append(entry)
-        self.save_memory(project_id, memory)
-        return entry
+        """メモリエントリを追加（追記のみでファイル全体は書き直さない）"""
+        return self.add_memory_entries(project_id, [entry])[0]
+
+    def add_memory_entries(self, project_id: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """複数のメモリエントリをまとめて追加（1回の追記で書き込む）"""
+        now = _now_iso()
+        for entry in entries:
+            _prepare_memory_entry(entry, now)
+        with _memory_lock:
+            log = self._load_memory_log(project_id)
+            if log is None:
+                log = _memory_log_state(self.get_memory(project_id))
+            for entry in entries:
+                log["positions"][entry["id"]] = len(log["memory"]["entries"])
+                log["memory"]["entries"].append(entry)
+            log["memory"]["updated_at"] = now
+            records = [{"op": "add", "entry": entry, "at": now} for entry in entries]
+            self._append_memory_log(project_id, records, log)
+        return entries
 
     def update_memory_entry(self, project_id: str, memory_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """メモリエントリを更新"""
-        memory = self.get_memory(project_id)
-        for entry in memory["entries"]:
-            if entry["id"] == memory_id:
-                entry.update(updates)
-                self.save_memory(project_id, memory)
-                return entry
-        return None
+        with _memory_lock:
+            log = self._load_memory_log(project_id)
+            if log is None:
+                return None
+            position = log["positions"].get(memory_id)
+            if position is None:
+                return None
+            now = _now_iso()
+            entry = log["memory"]["entries"][position]
+            entry.update(updates)
+            log["memory"]["updated_at"] = now
+            log["tombstones"] += 1
+            record = {"op": "upd", "id": memory_id, "patch": updates, "at": now}
+            self._append_memory_log(project_id, [record], log)
+            return entry
 
     def delete_memory_entry(self, project_id: str, memory_id: str) -> bool:
         """メモリエントリを削除"""
-        memory = self.get_memory(project_id)
-        original_len = len(memory["entries"])
-        memory["entries"] = [e for e in memory["entries"] if e["id"] != memory_id]
-        if len(memory["entries"]) < original_len:
-            self.save_memory(project_id, memory)
+        with _memory_lock:
+            log = self._load_memory_log(project_id)
+            if log is None:
+                return False
+            position = log["positions"].pop(memory_id, None)
+            if position is None:
+                return False
+            memory = log["memory"]
+            del memory["entries"][position]
+            # 削除位置より後ろのエントリだけ位置を詰める
+            for entry in memory["entries"][position:]:
+                log["positions"][entry["id"]] -= 1
+            now = _now_iso()
+            memory["updated_at"] = now
+            log["tombstones"] += 1
+            self._append_memory_log(project_id, [{"op": "del", "id": memory_id, "at": now}], log)
             return True
-        return False
 
     def clear_memory(self, project_id: str):
         """全メモリを削除"""
@@ -201,12 +1062,10 @@ class LocalStorage:
     def get_summaries(self, project_id: str) -> Dict[str, Any]:
         """会話サマリー一覧を取得"""
         path = self._summaries_path(project_id)
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
+        try:
+            return self._load_json(path)
+        except (orjson.JSONDecodeError, IOError):
+            pass
         # デフォルトの空サマリー
         return {
             "version": 1,
@@ -218,29 +1077,17 @@ class LocalStorage:
         """会話サマリーを保存"""
         path = self._summaries_path(project_id)
         self._ensure_dir(os.path.dirname(path))
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(summaries, f, indent=2, ensure_ascii=False)
+        self._save_json(project_id, path, summaries)
 
     def add_summary(self, project_id: str, summary: Dict[str, Any], max_entries: int = 15):
         """サマリーを追加（max_entries超過時は古いものを削除）"""
+        self.add_summaries(project_id, [summary], max_entries)
+
+    def add_summaries(self, project_id: str, new_summaries: List[Dict[str, Any]], max_entries: int = 15):
+        """複数のサマリーを順に追加（1回の書き込みで保存）"""
         summaries = self.get_summaries(project_id)
-        if "summarized_at" not in summary:
-            summary["summarized_at"] = datetime.utcnow().isoformat()
-        existing = next(
-            (s for s in summaries.get("entries", []) if s.get("conversation_id") == summary.get("conversation_id")),
-            None
-        )
-        if existing and existing.get("message_count", 0) >= summary.get("message_count", 0):
-            return
-        summaries["entries"] = [
-            s for s in summaries.get("entries", [])
-            if s.get("conversation_id") != summary.get("conversation_id")
-        ]
-        summaries["entries"].insert(0, summary)  # 新しいものを先頭に
-        # 古いものを削除
-        if len(summaries["entries"]) > max_entries:
-            summaries["entries"] = summaries["entries"][:max_entries]
-        self.save_summaries(project_id, summaries)
+        if _merge_summaries(summaries, new_summaries, max_entries):
+            self.save_summaries(project_id, summaries)
 
     def delete_summary(self, project_id: str, conversation_id: str) -> bool:
         """特定の会話サマリーを削除"""
@@ -262,21 +1109,40 @@ class LocalStorage:
 # -------- GCS backend --------
 class GCSStorage:
     def __init__(self):
-        from google.cloud import storage  # lazy import
+        # lazy import
+        import google.auth
+        from google.auth.transport.requests import AuthorizedSession
+        from google.cloud import storage
+        from requests.adapters import HTTPAdapter
         if not GCS_BUCKET:
             raise ValueError("GCS_BUCKET is required for GCS storage")
-        self.client = storage.Client()
+        # 接続プールを広げてkeep-alive接続を使い回す
+        # （既定の10本だとプールから溢れた接続が毎回張り直される）
+        credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+        session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=GCS_HTTP_POOL_SIZE, pool_maxsize=GCS_HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        self.client = storage.Client(project=project, credentials=credentials, _http=session)
         self.bucket = self.client.bucket(GCS_BUCKET)
         self.prefix = GCS_PREFIX.rstrip('/')
+        # プロジェクトごとのBlob名の接頭辞（呼び出しのたびに組み立て直さないようキャッシュ）
+        self._project_bases: Dict[str, str] = {}
+
+    def _project_base(self, project_id: str) -> str:
+        base = self._project_bases.get(project_id)
+        if base is None:
+            base = "/".join(p for p in [self.prefix, "projects", project_id] if p)
+            self._project_bases[project_id] = base
+        return base
 
     def _path(self, project_id: str, kind: str, filename: str) -> str:
-        parts = [p for p in [self.prefix, "projects", project_id, kind, filename] if p]
-        return "/".join(parts)
+        parts = [p for p in [kind, filename] if p]
+        return "/".join([self._project_base(project_id), *parts])
 
     def create_conversation(self, project_id: str, conversation_id: str) -> Dict[str, Any]:
         conversation = {
             "id": conversation_id,
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": _now_iso(),
             "title": "New Conversation",
             "messages": []
         }
@@ -284,59 +1150,221 @@ class GCSStorage:
         return conversation
 
     def get_conversation(self, project_id: str, conversation_id: str) -> Optional[Dict[str, Any]]:
-        blob = self.bucket.blob(self._path(project_id, "conversations", f"{conversation_id}.json"))
-        if not blob.exists():
-            return None
+        # exists() を挟むとHTTPの往復が2回になるため、直接ダウンロードして
+        # 存在しない場合（NotFound）も含めて失敗時はNoneを返す
+        blob = self._conv_blob(project_id, conversation_id)
         try:
-            data = blob.download_as_text()
-            return json.loads(data)
+            return orjson.loads(blob.download_as_bytes())
         except Exception:
             return None
 
+    def _conv_blob(self, project_id: str, conversation_id: str):
+        return self.bucket.blob(self._path(project_id, "conversations", f"{conversation_id}.json"))
+
+    @staticmethod
+    def _upload_conversation(blob, conversation: Dict[str, Any], **kwargs):
+        # 一覧用のメタデータをカスタムメタデータにも載せ、インデックス再構築時に本体を読まずに済むようにする
+        record = _index_record(conversation)
+        blob.metadata = {**record, "message_count": str(record["message_count"])}
+        data = _dumps(conversation, indent=JSON_INDENT)
+        if STORAGE_COMPRESS:
+            # download_as_bytes は Content-Encoding: gzip のオブジェクトを自動で展開するため読み込み側の変更は不要
+            blob.content_encoding = "gzip"
+            data = gzip.compress(data, compresslevel=GCS_GZIP_LEVEL)
+        blob.upload_from_string(data, content_type="application/json", **kwargs)
+
     def save_conversation(self, project_id: str, conversation: Dict[str, Any]):
-        blob = self.bucket.blob(self._path(project_id, "conversations", f"{conversation['id']}.json"))
-        blob.upload_from_string(json.dumps(conversation, ensure_ascii=False, indent=2), content_type="application/json")
+        self._upload_conversation(self._conv_blob(project_id, conversation['id']), conversation)
+        self._update_index(project_id, conversation=conversation)
+
+    def _update_conversation(
+        self,
+        project_id: str,
+        conversation_id: str,
+        mutate: Callable[[Dict[str, Any]], None]
+    ) -> bool:
+        """
+        会話を読み込んで mutate で書き換えて保存する（会話が存在しなければFalse）
+
+        GCSは追記できないため全体を書き直す。読み込み時の世代を条件に保存し、
+        間に他の書き込みがあれば読み直して再試行する（更新の取りこぼしを防ぐ）
+        """
+        from google.api_core.exceptions import NotFound, PreconditionFailed  # lazy import
+        blob = self._conv_blob(project_id, conversation_id)
+        for _ in range(GCS_PRECONDITION_MAX_RETRIES):
+            try:
+                conversation = orjson.loads(blob.download_as_bytes())
+            except NotFound:
+                return False
+            before = _index_record(conversation)
+            mutate(conversation)
+            try:
+                self._upload_conversation(blob, conversation, if_generation_match=blob.generation)
+            except PreconditionFailed:
+                continue
+            # 一覧に出る項目が変わらなければインデックスの読み書き（2往復）を省く
+            if _index_record(conversation) != before:
+                self._update_index(project_id, conversation=conversation)
+            return True
+        raise RuntimeError(f"Conversation {conversation_id} is being updated concurrently")
+
+    def append_message(self, project_id: str, conversation_id: str, message: Dict[str, Any]) -> bool:
+        """会話にメッセージを追記"""
+        return self._update_conversation(
+            project_id, conversation_id, lambda conversation: conversation["messages"].append(message)
+        )
+
+    def set_conversation_title(self, project_id: str, conversation_id: str, title: str) -> bool:
+        """会話タイトルを変更"""
+        return self._update_conversation(
+            project_id, conversation_id, lambda conversation: conversation.update(title=title)
+        )
 
     def list_conversations(self, project_id: str) -> List[Dict[str, Any]]:
+        records, generation = self._load_index(project_id)
+        if records is None:
+            # インデックスがない（旧データ・破損）場合は全件読み込んで作り直す
+            from google.api_core.exceptions import PreconditionFailed  # lazy import
+            records = self._scan_conversations(project_id)
+            try:
+                self._write_index(project_id, records, generation)
+            except PreconditionFailed:
+                pass  # 他の書き込みが先にインデックスを作成した
+        return _sorted_index(records)
+
+    # 会話一覧インデックス（一覧のたびに全会話をダウンロードしないよう1 Blobに集約）
+    def _index_blob(self, project_id: str):
+        return self.bucket.blob(self._path(project_id, "conversations", CONVERSATION_INDEX_FILENAME))
+
+    def _load_index(self, project_id: str) -> Tuple[Optional[Dict[str, Dict[str, Any]]], int]:
+        """
+        インデックスを読み込む
+
+        Returns:
+            (インデックス（存在しない・形式が違う場合はNone）, 読み込んだBlobの世代（存在しなければ0）)
+        """
+        from google.api_core.exceptions import NotFound  # lazy import
+        blob = self._index_blob(project_id)
+        try:
+            raw = blob.download_as_bytes()
+        except NotFound:
+            return None, 0
+        try:
+            index = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return None, blob.generation
+        if not isinstance(index, dict) or index.get("version") != CONVERSATION_INDEX_VERSION:
+            return None, blob.generation
+        return index["conversations"], blob.generation
+
+    def _write_index(self, project_id: str, records: Dict[str, Dict[str, Any]], generation: int):
+        """
+        インデックスを書き込む
+
+        読み込み時の世代を条件に付けるため、間に他の書き込みがあれば
+        PreconditionFailed になる（世代0は「まだ存在しないこと」を条件にする）
+        """
+        index = {"version": CONVERSATION_INDEX_VERSION, "conversations": records}
+        self._index_blob(project_id).upload_from_string(
+            _dumps(index, indent=JSON_INDENT), content_type="application/json", if_generation_match=generation
+        )
+
+    def _scan_conversations(self, project_id: str) -> Dict[str, Dict[str, Any]]:
+        """会話Blobの一覧からインデックスを組み立てる"""
         prefix = self._path(project_id, "conversations", "")
-        blobs = self.client.list_blobs(self.bucket, prefix=prefix)
-        conversations = []
-        for blob in blobs:
-            if not blob.name.endswith('.json'):
-                continue
+        # 名前とカスタムメタデータだけを返させる（nextPageTokenがないとページングできない）
+        blobs = [
+            b for b in self.client.list_blobs(
+                self.bucket, prefix=prefix, fields="items(name,metadata),nextPageToken"
+            )
+            if b.name.endswith('.json') and not b.name.endswith("/" + CONVERSATION_INDEX_FILENAME)
+        ]
+
+        def read_one(blob) -> Optional[Dict[str, Any]]:
+            meta = blob.metadata or {}
             try:
-                data = json.loads(blob.download_as_text())
-                conversations.append({
-                    "id": data["id"],
-                    "created_at": data["created_at"],
-                    "title": data.get("title", "New Conversation"),
-                    "message_count": len(data.get("messages", []))
-                })
+                if "message_count" in meta:
+                    return {
+                        "id": meta["id"],
+                        "created_at": meta["created_at"],
+                        "title": meta.get("title", "New Conversation"),
+                        "message_count": int(meta["message_count"])
+                    }
+                # メタデータのない旧形式のBlobは本体をダウンロードする
+                return _index_record(orjson.loads(blob.download_as_bytes()))
             except Exception:
+                return None
+
+        # 旧形式のBlobはGETが必要で高レイテンシなので並行して処理する
+        return {r["id"]: r for r in _gcs_pool.map(read_one, blobs) if r is not None}
+
+    def _update_index(
+        self,
+        project_id: str,
+        conversation: Optional[Dict[str, Any]] = None,
+        removed_id: Optional[str] = None
+    ):
+        """会話の保存・削除をインデックスに反映（競合時は読み直して再試行）"""
+        from google.api_core.exceptions import NotFound, PreconditionFailed  # lazy import
+        for _ in range(GCS_PRECONDITION_MAX_RETRIES):
+            records, generation = self._load_index(project_id)
+            if records is None:
+                # スキャンには保存・削除済みの状態が反映される
+                records = self._scan_conversations(project_id)
+            elif conversation is not None:
+                record = _index_record(conversation)
+                if records.get(record["id"]) == record:
+                    return  # 既に同じ内容なので書き込まない
+                records[record["id"]] = record
+            elif removed_id is not None:
+                if removed_id not in records:
+                    return
+                del records[removed_id]
+            try:
+                self._write_index(project_id, records, generation)
+                return
+            except PreconditionFailed:
                 continue
-        conversations.sort(key=lambda x: x["created_at"], reverse=True)
-        return conversations
+        # 競合が続いた場合はインデックスを捨て、次の一覧取得時に作り直させる
+        logger.warning(
+            "Conversation index of project %s is being updated concurrently; dropping it to rebuild on next list",
+            project_id
+        )
+        try:
+            self._index_blob(project_id).delete()
+        except NotFound:
+            pass
 
     def delete_conversation(self, project_id: str, conversation_id: str) -> bool:
         """会話を削除"""
-        blob = self.bucket.blob(self._path(project_id, "conversations", f"{conversation_id}.json"))
-        if blob.exists():
+        from google.api_core.exceptions import NotFound  # lazy import
+        blob = self._conv_blob(project_id, conversation_id)
+        try:
             blob.delete()
-            return True
-        return False
+        except NotFound:
+            return False
+        self._update_index(project_id, removed_id=conversation_id)
+        return True
 
     def get_config(self, project_id: str, default_config: Dict[str, Any]) -> Dict[str, Any]:
         blob = self.bucket.blob(self._path(project_id, "", "config.json"))
-        if blob.exists():
-            try:
-                return json.loads(blob.download_as_text())
-            except Exception:
-                pass
+        try:
+            return orjson.loads(blob.download_as_bytes())
+        except Exception:
+            pass
         return default_config.copy()
 
     def save_config(self, project_id: str, config: Dict[str, Any]):
         blob = self.bucket.blob(self._path(project_id, "", "config.json"))
-        blob.upload_from_string(json.dumps(config, ensure_ascii=False, indent=2), content_type="application/json")
+        blob.upload_from_string(_dumps(config, indent=JSON_INDENT), content_type="application/json")
+
+    def flush(self, project_id: Optional[str] = None):
+        """書き込みは常に即時のため何もしない"""
+
+    @contextlib.contextmanager
+    def batch(self, project_id: str):
+        """書き込みは常に即時のため何もしない"""
+        yield
 
     def list_projects(self) -> List[str]:
         # プロジェクト一覧用の正しいprefixを構築
@@ -361,8 +1389,22 @@ class GCSStorage:
     def delete_project(self, project_id: str):
         prefix = self._path(project_id, "", "")
         blobs = list(self.client.list_blobs(self.bucket, prefix=prefix))
-        if blobs:
-            self.bucket.delete_blobs(blobs)
+        from google.api_core.exceptions import NotFound  # lazy import
+        # バッチリクエストで最大 GCS_BATCH_SIZE 件ずつまとめて削除する
+        for i in range(0, len(blobs), GCS_BATCH_SIZE):
+            chunk = blobs[i:i + GCS_BATCH_SIZE]
+            try:
+                with self.client.batch():
+                    for blob in chunk:
+                        blob.delete()
+            except NotFound:
+                # バッチは最初に失敗した削除の例外だけを送出するため、404の陰に他の失敗が
+                # 隠れていないよう1件ずつ削除し直す（削除済みの404だけを無視する）
+                for blob in chunk:
+                    try:
+                        blob.delete()
+                    except NotFound:
+                        pass
 
     def create_project(self, project_id: str) -> Dict[str, str]:
         # Create placeholder to ensure project appears in listings
@@ -375,35 +1417,37 @@ class GCSStorage:
     def get_memory(self, project_id: str) -> Dict[str, Any]:
         """ユーザーメモリを取得"""
         blob = self.bucket.blob(self._path(project_id, "", "memory.json"))
-        if blob.exists():
-            try:
-                return json.loads(blob.download_as_text())
-            except Exception:
-                pass
+        try:
+            return orjson.loads(blob.download_as_bytes())
+        except Exception:
+            pass
+        now = _now_iso()
         return {
             "version": 1,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
+            "created_at": now,
+            "updated_at": now,
             "entries": []
         }
 
     def save_memory(self, project_id: str, memory: Dict[str, Any]):
         """ユーザーメモリを保存"""
-        memory["updated_at"] = datetime.utcnow().isoformat()
+        memory["updated_at"] = _now_iso()
         blob = self.bucket.blob(self._path(project_id, "", "memory.json"))
-        blob.upload_from_string(json.dumps(memory, ensure_ascii=False, indent=2), content_type="application/json")
+        blob.upload_from_string(_dumps(memory, indent=JSON_INDENT), content_type="application/json")
 
     def add_memory_entry(self, project_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
         """メモリエントリを追加"""
+        return self.add_memory_entries(project_id, [entry])[0]
+
+    def add_memory_entries(self, project_id: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """複数のメモリエントリをまとめて追加（1回のアップロードで保存）"""
         memory = self.get_memory(project_id)
-        if "id" not in entry:
-            import uuid
-            entry["id"] = f"mem_{uuid.uuid4().hex[:12]}"
-        if "extracted_at" not in entry:
-            entry["extracted_at"] = datetime.utcnow().isoformat()
-        memory["entries"].append(entry)
+        now = _now_iso()
+        for entry in entries:
+            _prepare_memory_entry(entry, now)
+        memory["entries"].extend(entries)
         self.save_memory(project_id, memory)
-        return entry
+        return entries
 
     def update_memory_entry(self, project_id: str, memory_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """メモリエントリを更新"""
@@ -436,11 +1480,10 @@ class GCSStorage:
     def get_summaries(self, project_id: str) -> Dict[str, Any]:
         """会話サマリー一覧を取得"""
         blob = self.bucket.blob(self._path(project_id, "", "summaries.json"))
-        if blob.exists():
-            try:
-                return json.loads(blob.download_as_text())
-            except Exception:
-                pass
+        try:
+            return orjson.loads(blob.download_as_bytes())
+        except Exception:
+            pass
         return {
             "version": 1,
             "max_entries": 15,
@@ -450,27 +1493,17 @@ class GCSStorage:
     def save_summaries(self, project_id: str, summaries: Dict[str, Any]):
         """会話サマリーを保存"""
         blob = self.bucket.blob(self._path(project_id, "", "summaries.json"))
-        blob.upload_from_string(json.dumps(summaries, ensure_ascii=False, indent=2), content_type="application/json")
+        blob.upload_from_string(_dumps(summaries, indent=JSON_INDENT), content_type="application/json")
 
     def add_summary(self, project_id: str, summary: Dict[str, Any], max_entries: int = 15):
         """サマリーを追加（max_entries超過時は古いものを削除）"""
+        self.add_summaries(project_id, [summary], max_entries)
+
+    def add_summaries(self, project_id: str, new_summaries: List[Dict[str, Any]], max_entries: int = 15):
+        """複数のサマリーを順に追加（1回の書き込みで保存）"""
         summaries = self.get_summaries(project_id)
-        if "summarized_at" not in summary:
-            summary["summarized_at"] = datetime.utcnow().isoformat()
-        existing = next(
-            (s for s in summaries.get("entries", []) if s.get("conversation_id") == summary.get("conversation_id")),
-            None
-        )
-        if existing and existing.get("message_count", 0) >= summary.get("message_count", 0):
-            return
-        summaries["entries"] = [
-            s for s in summaries.get("entries", [])
-            if s.get("conversation_id") != summary.get("conversation_id")
-        ]
-        summaries["entries"].insert(0, summary)
-        if len(summaries["entries"]) > max_entries:
-            summaries["entries"] = summaries["entries"][:max_entries]
-        self.save_summaries(project_id, summaries)
+        if _merge_summaries(summaries, new_summaries, max_entries):
+            self.save_summaries(project_id, summaries)
 
     def delete_summary(self, project_id: str, conversation_id: str) -> bool:
         """特定の会話サマリーを削除"""
@@ -489,21 +1522,260 @@ class GCSStorage:
         self.save_summaries(project_id, summaries)
 
 
+# -------- In-memory backend --------
+class MemoryStorage:
+    """
+    プロセス内のdictだけに保存するバックエンド（STORAGE_BACKEND=memory）
+
+    ディスクやネットワークを使わないため単体テストや動作確認向け。内容はプロセス終了で消える。
+    呼び出し側が結果を書き換えても保存内容が変わらないよう、読み書きのたびにコピーする。
+    """
+
+    def __init__(self):
+        self._projects: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def _project(self, project_id: str) -> Dict[str, Any]:
+        return self._projects.setdefault(project_id, {"conversations": {}})
+
+    def flush(self, project_id: Optional[str] = None):
+        """書き込みは常に即時のため何もしない"""
+
+    @contextlib.contextmanager
+    def batch(self, project_id: str):
+        """書き込みは常に即時のため何もしない"""
+        yield
+
+    def list_projects(self) -> List[str]:
+        with self._lock:
+            return sorted(self._projects) or ["default"]
+
+    def delete_project(self, project_id: str):
+        with self._lock:
+            self._projects.pop(project_id, None)
+
+    def create_project(self, project_id: str) -> Dict[str, str]:
+        with self._lock:
+            self._project(project_id)
+        return {"id": project_id, "status": "created"}
+
+    # Conversations
+    def create_conversation(self, project_id: str, conversation_id: str) -> Dict[str, Any]:
+        conversation = {
+            "id": conversation_id,
+            "created_at": _now_iso(),
+            "title": "New Conversation",
+            "messages": []
+        }
+        self.save_conversation(project_id, conversation)
+        return conversation
+
+    def get_conversation(self, project_id: str, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conversation = self._project(project_id)["conversations"].get(conversation_id)
+            return copy.deepcopy(conversation)
+
+    def save_conversation(self, project_id: str, conversation: Dict[str, Any]):
+        with self._lock:
+            self._project(project_id)["conversations"][conversation["id"]] = copy.deepcopy(conversation)
+
+    def append_message(self, project_id: str, conversation_id: str, message: Dict[str, Any]) -> bool:
+        """会話にメッセージを追記（会話が存在しなければFalse）"""
+        with self._lock:
+            conversation = self._project(project_id)["conversations"].get(conversation_id)
+            if conversation is None:
+                return False
+            conversation["messages"].append(copy.deepcopy(message))
+            return True
+
+    def set_conversation_title(self, project_id: str, conversation_id: str, title: str) -> bool:
+        """会話タイトルを変更（会話が存在しなければFalse）"""
+        with self._lock:
+            conversation = self._project(project_id)["conversations"].get(conversation_id)
+            if conversation is None:
+                return False
+            conversation["title"] = title
+            return True
+
+    def list_conversations(self, project_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            conversations = self._project(project_id)["conversations"]
+            return _sorted_index({cid: _index_record(c) for cid, c in conversations.items()})
+
+    def delete_conversation(self, project_id: str, conversation_id: str) -> bool:
+        """会話を削除"""
+        with self._lock:
+            return self._project(project_id)["conversations"].pop(conversation_id, None) is not None
+
+    # Config
+    def get_config(self, project_id: str, default_config: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            config = self._project(project_id).get("config")
+            return copy.deepcopy(config) if config is not None else default_config.copy()
+
+    def save_config(self, project_id: str, config: Dict[str, Any]):
+        with self._lock:
+            self._project(project_id)["config"] = copy.deepcopy(config)
+
+    # ========== メモリ操作 ==========
+
+    def get_memory(self, project_id: str) -> Dict[str, Any]:
+        """ユーザーメモリを取得"""
+        with self._lock:
+            memory = self._project(project_id).get("memory")
+            if memory is not None:
+                return copy.deepcopy(memory)
+        now = _now_iso()
+        return {
+            "version": 1,
+            "created_at": now,
+            "updated_at": now,
+            "entries": []
+        }
+
+    def save_memory(self, project_id: str, memory: Dict[str, Any]):
+        """ユーザーメモリを保存"""
+        memory["updated_at"] = _now_iso()
+        with self._lock:
+            self._project(project_id)["memory"] = copy.deepcopy(memory)
+
+    def add_memory_entry(self, project_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """メモリエントリを追加"""
+        return self.add_memory_entries(project_id, [entry])[0]
+
+    def add_memory_entries(self, project_id: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """複数のメモリエントリをまとめて追加"""
+        now = _now_iso()
+        for entry in entries:
+            _prepare_memory_entry(entry, now)
+        with self._lock:
+            memory = self.get_memory(project_id)
+            memory["entries"].extend(entries)
+            self.save_memory(project_id, memory)
+        return entries
+
+    def update_memory_entry(self, project_id: str, memory_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """メモリエントリを更新"""
+        with self._lock:
+            memory = self.get_memory(project_id)
+            for entry in memory["entries"]:
+                if entry["id"] == memory_id:
+                    entry.update(updates)
+                    self.save_memory(project_id, memory)
+                    return entry
+        return None
+
+    def delete_memory_entry(self, project_id: str, memory_id: str) -> bool:
+        """メモリエントリを削除"""
+        with self._lock:
+            memory = self.get_memory(project_id)
+            original_len = len(memory["entries"])
+            memory["entries"] = [e for e in memory["entries"] if e["id"] != memory_id]
+            if len(memory["entries"]) < original_len:
+                self.save_memory(project_id, memory)
+                return True
+        return False
+
+    def clear_memory(self, project_id: str):
+        """全メモリを削除"""
+        with self._lock:
+            memory = self.get_memory(project_id)
+            memory["entries"] = []
+            self.save_memory(project_id, memory)
+
+    # ========== サマリー操作 ==========
+
+    def get_summaries(self, project_id: str) -> Dict[str, Any]:
+        """会話サマリー一覧を取得"""
+        with self._lock:
+            summaries = self._project(project_id).get("summaries")
+            if summaries is not None:
+                return copy.deepcopy(summaries)
+        return {
+            "version": 1,
+            "max_entries": 15,
+            "entries": []
+        }
+
+    def save_summaries(self, project_id: str, summaries: Dict[str, Any]):
+        """会話サマリーを保存"""
+        with self._lock:
+            self._project(project_id)["summaries"] = copy.deepcopy(summaries)
+
+    def add_summary(self, project_id: str, summary: Dict[str, Any], max_entries: int = 15):
+        """サマリーを追加（max_entries超過時は古いものを削除）"""
+        self.add_summaries(project_id, [summary], max_entries)
+
+    def add_summaries(self, project_id: str, new_summaries: List[Dict[str, Any]], max_entries: int = 15):
+        """複数のサマリーを順に追加"""
+        with self._lock:
+            summaries = self.get_summaries(project_id)
+            if _merge_summaries(summaries, new_summaries, max_entries):
+                self.save_summaries(project_id, summaries)
+
+    def delete_summary(self, project_id: str, conversation_id: str) -> bool:
+        """特定の会話サマリーを削除"""
+        with self._lock:
+            summaries = self.get_summaries(project_id)
+            original_len = len(summaries["entries"])
+            summaries["entries"] = [s for s in summaries["entries"] if s["conversation_id"] != conversation_id]
+            if len(summaries["entries"]) < original_len:
+                self.save_summaries(project_id, summaries)
+                return True
+        return False
+
+    def clear_summaries(self, project_id: str):
+        """全サマリーを削除"""
+        with self._lock:
+            summaries = self.get_summaries(project_id)
+            summaries["entries"] = []
+            self.save_summaries(project_id, summaries)
+
+
+# バックエンドのクラスはimport時に決定し、インスタンスは初回アクセス時に作る
+# （GCSの認証情報がない環境でもimport自体は失敗させない）
+_BACKENDS = {"gcs": GCSStorage, "memory": MemoryStorage}
+_backend_cls = _BACKENDS.get(STORAGE_BACKEND, LocalStorage)
 _backend = None
+_backend_lock = threading.Lock()
 
 
 def _get_backend():
     global _backend
-    if _backend:
+    backend = _backend
+    if backend is not None:
+        return backend
+    # 初回の同時アクセスで複数のインスタンス（GCSの認証・接続）を作らないようロックして再確認
+    with _backend_lock:
+        if _backend is None:
+            _backend = _backend_cls()
         return _backend
-    if STORAGE_BACKEND == "gcs":
-        _backend = GCSStorage()
-    else:
-        _backend = LocalStorage()
-    return _backend
 
 
 # Public API wrappers -------------------------------------------------
+def warm_up():
+    """バックエンドを事前に生成する（初回リクエストでGCSの認証・接続待ちが発生しないように）"""
+    _get_backend()
+
+
+@atexit.register
+def flush():
+    """遅延させている書き込みを書き出す（バックエンド未生成なら何もしない）"""
+    backend = _backend
+    if backend is not None:
+        backend.flush()
+
+
+def batch(project_id: str = "default"):
+    """
+    プロジェクトのサマリー・設定の書き込みをまとめるコンテキストマネージャ
+
+    with storage.batch(project_id): の中の保存は溜めておき、抜けるときに1回だけ書き出す
+    （ローカル保存のみ。ブロック内の読み込みには溜めた内容が反映される）
+    """
+    return _get_backend().batch(project_id)
+
+
 def create_conversation(conversation_id: str, project_id: str = "default") -> Dict[str, Any]:
     return _get_backend().create_conversation(project_id, conversation_id)
 
@@ -525,17 +1797,13 @@ def delete_conversation(conversation_id: str, project_id: str = "default") -> bo
     return _get_backend().delete_conversation(project_id, conversation_id)
 
 
-def add_user_message(conversation_id: str, content: str, project_id: str = "default"):
-    conversation = get_conversation(conversation_id, project_id)
-    if conversation is None:
+def _append_message(conversation_id: str, message: Dict[str, Any], project_id: str):
+    if not _get_backend().append_message(project_id, conversation_id, message):
         raise ValueError(f"Conversation {conversation_id} not found")
 
-    conversation["messages"].append({
-        "role": "user",
-        "content": content
-    })
 
-    save_conversation(conversation, project_id)
+def add_user_message(conversation_id: str, content: str, project_id: str = "default"):
+    _append_message(conversation_id, {"role": "user", "content": content}, project_id)
 
 
 def add_assistant_message(
@@ -545,28 +1813,19 @@ def add_assistant_message(
     stage3: Dict[str, Any],
     project_id: str = "default"
 ):
-    conversation = get_conversation(conversation_id, project_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
-    conversation["messages"].append({
+    message = {
         "role": "assistant",
         "stage1": stage1,
         "stage2": stage2,
         "stage3": stage3
-    })
-
-    save_conversation(conversation, project_id)
+    }
+    _append_message(conversation_id, message, project_id)
 
 
 def update_conversation_title(conversation_id: str, title: str, project_id: str = "default"):
-    conversation = get_conversation(conversation_id, project_id)
-    if conversation is None:
+    if not _get_backend().set_conversation_title(project_id, conversation_id, title):
         raise ValueError(f"Conversation {conversation_id} not found")
 
-    conversation["title"] = title
-    save_conversation(conversation, project_id)
-
 
 def get_config(project_id: str, default_config: Dict[str, Any]) -> Dict[str, Any]:
     return _get_backend().get_config(project_id, default_config)
@@ -605,6 +1864,11 @@ def add_memory_entry(entry: Dict[str, Any], project_id: str = "default") -> Dict
     return _get_backend().add_memory_entry(project_id, entry)
 
 
+def add_memory_entries(entries: List[Dict[str, Any]], project_id: str = "default") -> List[Dict[str, Any]]:
+    """複数のメモリエントリをまとめて追加"""
+    return _get_backend().add_memory_entries(project_id, entries)
+
+
 def update_memory_entry(memory_id: str, updates: Dict[str, Any], project_id: str = "default") -> Optional[Dict[str, Any]]:
     """メモリエントリを更新"""
     return _get_backend().update_memory_entry(project_id, memory_id, updates)
@@ -632,6 +1896,11 @@ def add_summary(summary: Dict[str, Any], project_id: str = "default", max_entrie
     return _get_backend().add_summary(project_id, summary, max_entries)
 
 
+def add_summaries(summaries: List[Dict[str, Any]], project_id: str = "default", max_entries: int = 15):
+    """複数のサマリーをまとめて追加"""
+    return _get_backend().add_summaries(project_id, summaries, max_entries)
+
+
 def delete_summary(conversation_id: str, project_id: str = "default") -> bool:
     """特定の会話サマリーを削除"""
     return _get_backend().delete_summary(project_id, conversation_id)
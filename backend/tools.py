@@ -6,15 +6,42 @@ LLMエージェントが使用できるツールを定義し、実行する
 import os
 import logging
 import time
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
 # Tavily API Key
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+# Tavily用の共有HTTPクライアント（呼び出しごとのTLSハンドシェイクを避ける）
+_client: Optional[httpx.AsyncClient] = None
+MAX_CONNECTIONS = 32
+
+
+def _get_client() -> httpx.AsyncClient:
+    """共有AsyncClientを取得（未作成・クローズ済みなら作成）"""
+    global _client
+    if _client is None or _client.is_closed:
+        # ボディは content= でバイト列を渡すため Content-Type を明示する
+        _client = httpx.AsyncClient(
+            headers={"Content-Type": "application/json"},
+            http2=True,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """共有AsyncClientをクローズ（アプリ終了時に呼ぶ）"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 
 # =============================================================================
@@ -47,7 +74,7 @@ AVAILABLE_TOOLS = [WEB_SEARCH_TOOL]
 # ツール実行ログ
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class ToolExecutionLog:
     """ツール実行ログ"""
     timestamp: str
@@ -73,15 +100,16 @@ class ToolLogger:
         result: str,
         execution_time_ms: int,
         success: bool = True,
-        error_message: str = None
+        error_message: str = None,
+        result_count: int = 0
     ) -> ToolExecutionLog:
-        """ツール実行を記録"""
+        """ツール実行を記録（result_count は検索結果数など、呼び出し側が把握している件数）"""
         log = ToolExecutionLog(
             timestamp=datetime.utcnow().isoformat(),
             tool_name=tool_name,
             arguments=arguments,
             result_preview=result[:100] if result else "",
-            result_count=result.count("\n- ") if result else 0,
+            result_count=result_count,
             execution_time_ms=execution_time_ms,
             success=success,
             error_message=error_message,
@@ -92,8 +120,20 @@ class ToolLogger:
         return log
 
     def get_logs(self) -> List[Dict[str, Any]]:
-        """全ログを取得"""
-        return [asdict(log) for log in self.logs]
+        """全ログを取得（asdictの再帰コピーを避け、フィールドを直接dictにする）"""
+        return [
+            {
+                "timestamp": log.timestamp,
+                "tool_name": log.tool_name,
+                "arguments": dict(log.arguments),
+                "result_preview": log.result_preview,
+                "result_count": log.result_count,
+                "execution_time_ms": log.execution_time_ms,
+                "success": log.success,
+                "error_message": log.error_message,
+            }
+            for log in self.logs
+        ]
 
 
 # =============================================================================
@@ -111,7 +151,8 @@ async def execute_web_search(query: str, tool_logger: ToolLogger = None) -> str:
     Returns:
         検索結果をテキスト形式で整形したもの
     """
-    start_time = time.time()
+    # 経過時間は壁時計の補正に影響されない単調増加クロックで整数のまま計る
+    start_ns = time.perf_counter_ns()
 
     if not TAVILY_API_KEY:
         error_msg = "Error: Web search not configured (TAVILY_API_KEY not set)"
@@ -128,58 +169,54 @@ async def execute_web_search(query: str, tool_logger: ToolLogger = None) -> str:
         return error_msg
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.tavily.com/search",
-                json={
-                    "api_key": TAVILY_API_KEY,
-                    "query": query,
-                    "search_depth": "basic",  # basic or advanced
-                    "max_results": 10,
-                    "include_answer": True,  # AIサマリーを含める
-                },
-                timeout=30.0
+        response = await _get_client().post(
+            TAVILY_SEARCH_URL,
+            content=orjson.dumps({
+                "api_key": TAVILY_API_KEY,
+                "query": query,
+                "search_depth": "basic",  # basic or advanced
+                "max_results": 10,
+                "include_answer": True,  # AIサマリーを含める
+            }),
+            timeout=30.0
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+
+        # 結果をテキストに整形（1件ごとに1つの文字列にまとめて最後に連結する）
+        results = data.get("results", [])
+        parts = []
+
+        # AIサマリーがあれば追加
+        if data.get("answer"):
+            parts.append(f"Summary: {data['answer']}\n\n")
+
+        parts.append("Sources:")
+        for r in results:
+            title = r.get("title", "No title")
+            content = r.get("content", "")[:300]
+            url = r.get("url", "")
+            parts.append(f"\n- {title}\n  {content}...\n  URL: {url}\n")
+
+        result_text = "".join(parts)
+
+        execution_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+
+        if tool_logger:
+            tool_logger.log_execution(
+                tool_name="web_search",
+                arguments={"query": query},
+                result=result_text,
+                execution_time_ms=execution_time_ms,
+                success=True,
+                result_count=len(results)
             )
-            response.raise_for_status()
-            data = response.json()
-
-            # 結果をテキストに整形
-            results = data.get("results", [])
-            formatted = []
-
-            # AIサマリーがあれば追加
-            if data.get("answer"):
-                formatted.append(f"Summary: {data['answer']}")
-                formatted.append("")
-
-            formatted.append("Sources:")
-            for r in results:
-                title = r.get("title", "No title")
-                content = r.get("content", "")[:300]
-                url = r.get("url", "")
-                formatted.append(f"- {title}")
-                formatted.append(f"  {content}...")
-                formatted.append(f"  URL: {url}")
-                formatted.append("")
-
-            result_text = "\n".join(formatted) if formatted else "No results found"
-
-            execution_time_ms = int((time.time() - start_time) * 1000)
-
-            if tool_logger:
-                tool_logger.log_execution(
-                    tool_name="web_search",
-                    arguments={"query": query},
-                    result=result_text,
-                    execution_time_ms=execution_time_ms,
-                    success=True
-                )
-
-            logger.info(f"Web search for '{query}': {len(results)} results in {execution_time_ms}ms")
-            return result_text
+
+        logger.info(f"Web search for '{query}': {len(results)} results in {execution_time_ms}ms")
+        return result_text
 
     except Exception as e:
-        execution_time_ms = int((time.time() - start_time) * 1000)
+        execution_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
         error_msg = f"Error searching: {str(e)}"
 
         if tool_logger:
@@ -212,41 +249,40 @@ async def search_images(query: str, max_results: int = 8) -> List[Dict[str, str]
         return []
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.tavily.com/search",
-                json={
-                    "api_key": TAVILY_API_KEY,
-                    "query": query,
-                    "search_depth": "basic",
-                    "max_results": max_results,
-                    "include_images": True,
-                    "include_image_descriptions": True,
-                },
-                timeout=15.0
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            images = []
-            # Tavily APIのレスポンスから画像を取得
-            raw_images = data.get("images", [])
-            for img in raw_images[:max_results]:
-                if isinstance(img, dict):
-                    url = img.get("url", "")
-                    desc = img.get("description", "")
-                elif isinstance(img, str):
-                    url = img
-                    desc = ""
-                else:
-                    continue
-
-                # 基本的なURLバリデーション
-                if url and url.startswith("http"):
-                    images.append({"url": url, "description": desc})
-
-            logger.info(f"Image search for '{query}': {len(images)} images found")
-            return images
+        response = await _get_client().post(
+            TAVILY_SEARCH_URL,
+            content=orjson.dumps({
+                "api_key": TAVILY_API_KEY,
+                "query": query,
+                "search_depth": "basic",
+                "max_results": max_results,
+                "include_images": True,
+                "include_image_descriptions": True,
+            }),
+            timeout=15.0
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+
+        images = []
+        # Tavily APIのレスポンスから画像を取得
+        raw_images = data.get("images", [])
+        for img in raw_images[:max_results]:
+            if isinstance(img, dict):
+                url = img.get("url", "")
+                desc = img.get("description", "")
+            elif isinstance(img, str):
+                url = img
+                desc = ""
+            else:
+                continue
+
+            # 基本的なURLバリデーション
+            if url and url.startswith("http"):
+                images.append({"url": url, "description": desc})
+
+        logger.info(f"Image search for '{query}': {len(images)} images found")
+        return images
 
     except Exception as e:
         logger.error(f"Image search failed: {e}")
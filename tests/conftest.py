@@ -0,0 +1,19 @@
+"""テスト共通のフィクスチャ"""
+
+import uuid
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def data_root(tmp_path_factory):
+    """セッション全体で1つだけ作るデータディレクトリの親"""
+    return tmp_path_factory.mktemp("llm_council_tests")
+
+
+@pytest.fixture
+def data_dir(data_root):
+    """テストごとのデータディレクトリ（セッション共通の親の下にUUID名で作る）"""
+    path = data_root / f"t_{uuid.uuid4().hex}"
+    path.mkdir()
+    return str(path)
@@ -0,0 +1,401 @@
+"""GCSバックエンドの単体テスト（世代番号付きの条件付き書き込みを再現するフェイクのバケットを使う）"""
+
+import gzip
+import logging
+import threading
+
+import orjson
+import pytest
+
+pytest.importorskip("google.api_core.exceptions")
+from google.api_core.exceptions import (  # noqa: E402
+    NotFound,
+    PreconditionFailed,
+    ServiceUnavailable,
+    from_http_status,
+)
+
+from backend import storage  # noqa: E402
+
+
+class FakeBucket:
+    """オブジェクトを世代番号付きで保持するバケット"""
+
+    def __init__(self):
+        self.objects = {}  # name -> (data, generation, metadata, content_encoding)
+        self.uploads = []  # (name, if_generation_match) のアップロード記録
+        self.downloads = []
+        self.before_upload = None  # 条件付きアップロードの直前に呼ぶフック（割り込む書き込みの再現用）
+        self.delete_status = {}  # バッチ削除で返すステータス（name -> ステータスコード）
+        self.batches = []
+        self.single_deletes = []
+        self.current_batch = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def put(self, name, data, metadata=None):
+        with self._lock:
+            self._generation += 1
+            self.objects[name] = (data, self._generation, metadata, None)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name, metadata=None):
+        self.bucket = bucket
+        self.name = name
+        self.metadata = metadata
+        self.content_encoding = None
+        self.generation = None
+
+    def download_as_bytes(self):
+        with self.bucket._lock:
+            if self.name not in self.bucket.objects:
+                raise NotFound(self.name)
+            data, self.generation, self.metadata, encoding = self.bucket.objects[self.name]
+        self.bucket.downloads.append(self.name)
+        # GCSは Content-Encoding: gzip のオブジェクトを展開して返す
+        return gzip.decompress(data) if encoding == "gzip" else data
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        if isinstance(data, str):
+            data = data.encode()
+        hook = self.bucket.before_upload
+        if if_generation_match is not None and hook is not None:
+            hook(self.name)
+        with self.bucket._lock:
+            self.bucket.uploads.append((self.name, if_generation_match))
+            current = self.bucket.objects.get(self.name)
+            if if_generation_match is not None and (current[1] if current else 0) != if_generation_match:
+                raise PreconditionFailed(self.name)
+            self.bucket._generation += 1
+            self.generation = self.bucket._generation
+            self.bucket.objects[self.name] = (data, self.generation, self.metadata, self.content_encoding)
+
+    def delete(self):
+        if self.bucket.current_batch is not None:
+            self.bucket.current_batch.append(self.name)
+            return
+        self.bucket.single_deletes.append(self.name)
+        status = self.bucket.delete_status.get(self.name)
+        if status is not None and status != 404:
+            raise from_http_status(status, self.name)
+        with self.bucket._lock:
+            if self.bucket.objects.pop(self.name, None) is None:
+                raise NotFound(self.name)
+
+
+class FakeBatch:
+    """削除を溜めて抜けるときに実行し、最初に失敗した削除の例外を送出するバッチ（ライブラリの既定動作）"""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.names = []
+
+    def append(self, name):
+        self.names.append(name)
+
+    def __enter__(self):
+        self.bucket.current_batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.bucket.current_batch = None
+        self.bucket.batches.append(self.names)
+        failed = None
+        for name in self.names:
+            status = self.bucket.delete_status.get(name)
+            if status is None:
+                status = 204 if self.bucket.objects.pop(name, None) is not None else 404
+            if not 200 <= status < 300 and failed is None:
+                failed = (status, name)
+        if failed is not None:
+            raise from_http_status(*failed)
+
+
+class FakeClient:
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def batch(self):
+        return FakeBatch(self.bucket)
+
+    def list_blobs(self, bucket, prefix="", fields=None):
+        with bucket._lock:
+            items = sorted(bucket.objects.items())
+        return [FakeBlob(bucket, name, meta) for name, (_, _, meta, _) in items if name.startswith(prefix)]
+
+
+INDEX_NAME = f"projects/p/conversations/{storage.CONVERSATION_INDEX_FILENAME}"
+
+
+@pytest.fixture
+def bucket():
+    return FakeBucket()
+
+
+@pytest.fixture
+def gcs(bucket):
+    # 認証・接続を行う __init__ を通さずにフェイクのクライアントを差し込む
+    backend = storage.GCSStorage.__new__(storage.GCSStorage)
+    backend.client = FakeClient(bucket)
+    backend.bucket = bucket
+    backend.prefix = ""
+    backend._project_bases = {}
+    return backend
+
+
+def _index_ids(bucket):
+    index = orjson.loads(bucket.objects[INDEX_NAME][0])
+    return sorted(index["conversations"])
+
+
+class TestGCSConversationIndex:
+    """会話一覧インデックスの条件付き更新のテスト"""
+
+    def test_index_is_created_with_generation_zero(self, gcs, bucket):
+        """インデックスがなければ「存在しないこと」（世代0）を条件に作成する"""
+        gcs.create_conversation("p", "c1")
+
+        assert (INDEX_NAME, 0) in bucket.uploads
+        assert [c["id"] for c in gcs.list_conversations("p")] == ["c1"]
+
+    def test_index_update_retries_on_precondition_failure(self, gcs, bucket):
+        """読み込みと書き込みの間に他の更新が入ったら読み直して再試行し、両方の更新を残す"""
+        gcs.create_conversation("p", "c1")
+
+        def interleave(name):
+            if name == INDEX_NAME:
+                bucket.before_upload = None
+                gcs.create_conversation("p", "c2")
+
+        bucket.before_upload = interleave
+        gcs.create_conversation("p", "c3")
+
+        assert _index_ids(bucket) == ["c1", "c2", "c3"]
+        index_uploads = [g for name, g in bucket.uploads if name == INDEX_NAME]
+        # c1の作成、c2の割り込み、c3の失敗した1回目と再試行
+        assert len(index_uploads) == 4
+
+    def test_index_is_dropped_when_retries_are_exhausted(self, gcs, bucket, caplog):
+        """競合が続いたらインデックスを消し（警告を残す）、次の一覧取得で作り直す"""
+        gcs.create_conversation("p", "c1")
+
+        def always_interfere(name):
+            if name == INDEX_NAME:
+                bucket.put(INDEX_NAME, bucket.objects[INDEX_NAME][0])
+
+        bucket.before_upload = always_interfere
+        with caplog.at_level(logging.WARNING, logger=storage.__name__):
+            gcs.create_conversation("p", "c2")
+        bucket.before_upload = None
+
+        assert INDEX_NAME not in bucket.objects
+        assert any("project p" in r.getMessage() for r in caplog.records)
+        assert sorted(c["id"] for c in gcs.list_conversations("p")) == ["c1", "c2"]
+        assert _index_ids(bucket) == ["c1", "c2"]
+
+    def test_index_is_rebuilt_after_deletion(self, gcs, bucket):
+        """インデックスが消えていたらメタデータから組み立て直し、世代0を条件に書き込む"""
+        gcs.create_conversation("p", "c1")
+        gcs.create_conversation("p", "c2")
+        gcs.append_message("p", "c1", {"role": "user", "content": "hi"})
+        bucket.objects.pop(INDEX_NAME)
+        bucket.uploads.clear()
+        bucket.downloads.clear()
+
+        conversations = {c["id"]: c for c in gcs.list_conversations("p")}
+
+        assert conversations["c1"]["message_count"] == 1
+        assert conversations["c2"]["message_count"] == 0
+        # メタデータを持つ会話は本体をダウンロードしない
+        assert bucket.downloads == []
+        assert bucket.uploads == [(INDEX_NAME, 0)]
+
+    def test_rebuild_downloads_legacy_blobs_without_metadata(self, gcs, bucket):
+        """メタデータのない旧形式の会話は本体を読んでインデックスに載せる"""
+        legacy = {"id": "old", "created_at": "2025-01-01T00:00:00", "title": "旧", "messages": [{"role": "user"}]}
+        bucket.put("projects/p/conversations/old.json", orjson.dumps(legacy))
+
+        assert gcs.list_conversations("p") == [
+            {"id": "old", "created_at": "2025-01-01T00:00:00", "title": "旧", "message_count": 1}
+        ]
+        assert bucket.downloads == ["projects/p/conversations/old.json"]
+
+    def test_corrupt_index_is_rebuilt(self, gcs, bucket):
+        """壊れたインデックスは読み込んだ世代を条件に作り直す"""
+        gcs.create_conversation("p", "c1")
+        bucket.put(INDEX_NAME, b"{not json")
+        generation = bucket.objects[INDEX_NAME][1]
+
+        assert [c["id"] for c in gcs.list_conversations("p")] == ["c1"]
+        assert bucket.uploads[-1] == (INDEX_NAME, generation)
+        assert _index_ids(bucket) == ["c1"]
+
+    def test_dropping_index_propagates_unexpected_errors(self, gcs, bucket):
+        """インデックスの削除に失敗した場合（404以外）は握りつぶさない"""
+        gcs.create_conversation("p", "c1")
+
+        def always_interfere(name):
+            if name == INDEX_NAME:
+                bucket.put(INDEX_NAME, bucket.objects[INDEX_NAME][0])
+
+        bucket.before_upload = always_interfere
+        bucket.delete_status[INDEX_NAME] = 503
+        with pytest.raises(ServiceUnavailable):
+            gcs.create_conversation("p", "c2")
+
+    def test_unchanged_title_skips_index_update(self, gcs, bucket):
+        """一覧に出る項目が変わらない更新ではインデックスを読み書きしない"""
+        gcs.create_conversation("p", "c1")
+        gcs.set_conversation_title("p", "c1", "タイトル")
+        bucket.uploads.clear()
+        bucket.downloads.clear()
+
+        assert gcs.set_conversation_title("p", "c1", "タイトル") is True
+
+        assert INDEX_NAME not in bucket.downloads
+        assert [name for name, _ in bucket.uploads] == ["projects/p/conversations/c1.json"]
+
+    def test_unchanged_record_skips_index_upload(self, gcs, bucket):
+        """保存し直してもインデックスの内容が同じなら書き込まない"""
+        conversation = gcs.create_conversation("p", "c1")
+        bucket.uploads.clear()
+
+        gcs.save_conversation("p", conversation)
+
+        assert [name for name, _ in bucket.uploads] == ["projects/p/conversations/c1.json"]
+
+    def test_delete_conversation_updates_index(self, gcs, bucket):
+        """削除した会話はインデックスからも外れる"""
+        gcs.create_conversation("p", "c1")
+        gcs.create_conversation("p", "c2")
+
+        assert gcs.delete_conversation("p", "c1") is True
+        assert gcs.delete_conversation("p", "c1") is False
+        assert _index_ids(bucket) == ["c2"]
+
+
+class TestGCSConversationUpdate:
+    """会話の読み込み・書き換え・条件付き保存のテスト"""
+
+    CONV_NAME = "projects/p/conversations/c1.json"
+
+    def _conversation(self, bucket):
+        return orjson.loads(bucket.blob(self.CONV_NAME).download_as_bytes())
+
+    def test_interleaved_append_is_not_lost(self, gcs, bucket):
+        """読み込みと保存の間に別の追記が入っても、読み直して両方のメッセージを残す"""
+        gcs.create_conversation("p", "c1")
+
+        def interleave(name):
+            if name == self.CONV_NAME:
+                bucket.before_upload = None
+                gcs.append_message("p", "c1", {"role": "user", "content": "first"})
+
+        bucket.before_upload = interleave
+        assert gcs.append_message("p", "c1", {"role": "assistant", "content": "second"}) is True
+
+        conversation = self._conversation(bucket)
+        assert [m["content"] for m in conversation["messages"]] == ["first", "second"]
+        assert gcs.list_conversations("p")[0]["message_count"] == 2
+
+    def test_title_update_keeps_concurrent_append(self, gcs, bucket):
+        """タイトル変更と追記が重なってもどちらも失われない"""
+        gcs.create_conversation("p", "c1")
+
+        def interleave(name):
+            if name == self.CONV_NAME:
+                bucket.before_upload = None
+                gcs.append_message("p", "c1", {"role": "user", "content": "hi"})
+
+        bucket.before_upload = interleave
+        assert gcs.set_conversation_title("p", "c1", "タイトル") is True
+
+        conversation = self._conversation(bucket)
+        assert conversation["title"] == "タイトル"
+        assert len(conversation["messages"]) == 1
+
+    def test_concurrent_appends_from_threads(self, gcs, bucket):
+        """複数スレッドから同時に追記しても全メッセージが残る"""
+        gcs.create_conversation("p", "c1")
+        start = threading.Barrier(4)
+
+        def append(i):
+            start.wait()
+            gcs.append_message("p", "c1", {"role": "user", "content": f"m{i}"})
+
+        threads = [threading.Thread(target=append, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        conversation = self._conversation(bucket)
+        assert sorted(m["content"] for m in conversation["messages"]) == ["m0", "m1", "m2", "m3"]
+        assert gcs.list_conversations("p")[0]["message_count"] == 4
+
+    def test_missing_conversation_returns_false(self, gcs, bucket):
+        """存在しない会話への追記は何も書かずにFalseを返す"""
+        assert gcs.append_message("p", "missing", {"role": "user", "content": "hi"}) is False
+        assert bucket.uploads == []
+
+    def test_gives_up_after_repeated_conflicts(self, gcs, bucket):
+        """競合が続く場合は再試行回数の上限で諦めてエラーにする"""
+        gcs.create_conversation("p", "c1")
+
+        def always_interfere(name):
+            if name == self.CONV_NAME:
+                bucket.put(self.CONV_NAME, bucket.objects[self.CONV_NAME][0])
+
+        bucket.before_upload = always_interfere
+        with pytest.raises(RuntimeError):
+            gcs.append_message("p", "c1", {"role": "user", "content": "hi"})
+
+
+class TestGCSDeleteProject:
+    """プロジェクト削除（バッチ削除）のテスト"""
+
+    def _put_project(self, bucket, count):
+        for i in range(count):
+            bucket.put(f"projects/p/conversations/c{i}.json", b"{}")
+        bucket.put("projects/q/conversations/c0.json", b"{}")
+
+    def test_deletes_all_blobs_in_batches(self, gcs, bucket, monkeypatch):
+        """プロジェクト配下のBlobを GCS_BATCH_SIZE 件ずつ削除し、他のプロジェクトは残す"""
+        monkeypatch.setattr(storage, "GCS_BATCH_SIZE", 2)
+        self._put_project(bucket, 3)
+
+        gcs.delete_project("p")
+
+        assert [len(names) for names in bucket.batches] == [2, 1]
+        assert list(bucket.objects) == ["projects/q/conversations/c0.json"]
+
+    def test_already_deleted_blobs_are_ignored(self, gcs, bucket):
+        """一覧取得後に他で消されたBlob（404）は成功扱い"""
+        self._put_project(bucket, 2)
+        bucket.delete_status["projects/p/conversations/c0.json"] = 404
+
+        gcs.delete_project("p")
+
+        assert "projects/p/conversations/c1.json" not in bucket.objects
+        assert "projects/q/conversations/c0.json" in bucket.objects
+
+    def test_failed_delete_raises(self, gcs, bucket):
+        """404以外で削除に失敗したBlobがあれば例外にする"""
+        self._put_project(bucket, 2)
+        bucket.delete_status["projects/p/conversations/c1.json"] = 503
+
+        with pytest.raises(ServiceUnavailable):
+            gcs.delete_project("p")
+
+    def test_failure_behind_not_found_still_raises(self, gcs, bucket):
+        """同じバッチで404の後ろにあった他の失敗も見逃さない"""
+        self._put_project(bucket, 3)
+        bucket.delete_status["projects/p/conversations/c0.json"] = 404
+        bucket.delete_status["projects/p/conversations/c2.json"] = 503
+
+        with pytest.raises(ServiceUnavailable):
+            gcs.delete_project("p")
@@ -3,24 +3,15 @@
 import pytest
 import os
 import json
-import tempfile
-import shutil
+from backend import job_manager as job_manager_module
 from backend.job_manager import JobManager
 
 
 @pytest.fixture
-def temp_data_dir():
-    """一時的なデータディレクトリを作成"""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    shutil.rmtree(temp_dir, ignore_errors=True)
-
-
-@pytest.fixture
-def job_manager(temp_data_dir, monkeypatch):
+def job_manager(data_dir, monkeypatch):
     """JobManagerのインスタンスを作成（ローカルストレージモード）"""
-    monkeypatch.setenv("STORAGE_BACKEND", "local")
-    monkeypatch.setenv("DATA_DIR", temp_data_dir)
+    monkeypatch.setattr(job_manager_module, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(job_manager_module, "DATA_BASE_DIR", data_dir)
     manager = JobManager()
     return manager
 
@@ -0,0 +1,81 @@
+"""Unit tests for llm_cache module."""
+
+import pytest
+
+from backend import llm_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def test_cache_roundtrip(cache_dir):
+    """保存したレスポンスを取得できる"""
+    cache = llm_cache.ResponseCache(cache_dir)
+    key = llm_cache.make_key("test/model", [{"role": "user", "content": "hi"}])
+
+    assert cache.get(key) is None
+    cache.set(key, {"content": "hello", "model": "test/model"})
+    assert cache.get(key) == {"content": "hello", "model": "test/model"}
+
+
+def test_cache_persists_across_instances(cache_dir):
+    """ディスクに永続化され、別インスタンス（再起動後）からも参照できる"""
+    key = llm_cache.make_key("test/model", [{"role": "user", "content": "hi"}])
+    llm_cache.ResponseCache(cache_dir).set(key, {"content": "persisted"})
+
+    assert llm_cache.ResponseCache(cache_dir).get(key) == {"content": "persisted"}
+
+
+def test_cache_expires(cache_dir):
+    """TTLを過ぎたエントリは返さない"""
+    cache = llm_cache.ResponseCache(cache_dir, ttl_s=-1)
+    cache.set("key", {"content": "stale"})
+
+    assert cache.get("key") is None
+
+
+def test_memory_lru_eviction(cache_dir):
+    """メモリLRUは上限を超えると古いものから追い出す（ディスクには残る）"""
+    cache = llm_cache.ResponseCache(cache_dir, memory_max_entries=2)
+    for i in range(3):
+        cache.set(f"k{i}", {"i": i})
+
+    assert list(cache._memory) == ["k1", "k2"]
+    assert cache.get("k0") == {"i": 0}
+
+
+def test_key_depends_on_model_and_messages():
+    """モデルまたはメッセージが異なればキーも異なる"""
+    messages = [{"role": "user", "content": "hi"}]
+    assert llm_cache.make_key("a", messages) == llm_cache.make_key("a", [dict(m) for m in messages])
+    assert llm_cache.make_key("a", messages) != llm_cache.make_key("b", messages)
+    assert llm_cache.make_key("a", messages) != llm_cache.make_key("a", [{"role": "user", "content": "yo"}])
+
+
+def test_expired_entries_are_purged_on_set(cache_dir):
+    """保存のたびに期限切れのエントリをディスクから消す（長時間動かしても溜まらない）"""
+    cache = llm_cache.ResponseCache(cache_dir)
+    cache._db.execute("INSERT INTO responses VALUES ('stale', x'7b7d', 0)")
+
+    cache.set("fresh", {"content": "new"})
+
+    assert [r[0] for r in cache._db.execute("SELECT key FROM responses")] == ["fresh"]
+
+
+def test_disk_size_limit_evicts_soonest_expiring(cache_dir, monkeypatch):
+    """ディスクの合計サイズが上限を超えたら期限の近いものから追い出す"""
+    clock = iter(range(100))
+    monkeypatch.setattr(llm_cache.time, "time", lambda: float(next(clock)))
+    value = {"content": "x" * 100}
+    size = len(llm_cache.orjson.dumps(value))
+    cache = llm_cache.ResponseCache(cache_dir, disk_max_bytes=size * 2)
+
+    for i in range(3):
+        cache.set(f"k{i}", value)
+
+    assert sorted(r[0] for r in cache._db.execute("SELECT key FROM responses")) == ["k1", "k2"]
+    assert "k0" not in cache._memory
+    assert cache.get("k0") is None
+    assert cache.get("k2") == value
@@ -1,34 +1,25 @@
 """メモリシステムの単体テスト"""
 
 import pytest
-import tempfile
-import shutil
-import os
-import sys
-
-# プロジェクトルートをパスに追加
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend import storage
 
 
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    """
+    インメモリのバックエンドに切り替える
+
+    このモジュールはメモリ・サマリーの操作の意味だけを検証するため、ディスクI/Oは不要
+    （ローカル保存の形式は test_storage.py で検証する）
+    """
+    monkeypatch.setattr(storage, "_backend_cls", storage.MemoryStorage)
+    monkeypatch.setattr(storage, "_backend", None)
+
+
 class TestMemoryStorage:
     """メモリストレージの単体テスト"""
 
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        """テスト用の一時ディレクトリを作成"""
-        self.temp_dir = tempfile.mkdtemp()
-        self.original_data_dir = storage.DATA_BASE_DIR
-        storage.DATA_BASE_DIR = self.temp_dir
-        # バックエンドをリセット
-        storage._backend = None
-        yield
-        # クリーンアップ
-        storage.DATA_BASE_DIR = self.original_data_dir
-        storage._backend = None
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
-
     def test_get_memory_empty(self):
         """空のメモリを取得"""
         memory = storage.get_memory("test_project")
@@ -130,18 +121,6 @@ class TestMemoryStorage:
 class TestSummaryStorage:
     """サマリーストレージの単体テスト"""
 
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        """テスト用の一時ディレクトリを作成"""
-        self.temp_dir = tempfile.mkdtemp()
-        self.original_data_dir = storage.DATA_BASE_DIR
-        storage.DATA_BASE_DIR = self.temp_dir
-        storage._backend = None
-        yield
-        storage.DATA_BASE_DIR = self.original_data_dir
-        storage._backend = None
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
-
     def test_get_summaries_empty(self):
         """空のサマリーを取得"""
         summaries = storage.get_summaries("test_project")
@@ -170,9 +149,9 @@ class TestSummaryStorage:
 
     def test_summary_rotation(self):
         """サマリーのローテーション（最大15件）"""
-        # 20件追加
-        for i in range(20):
-            summary = {
+        # 20件をまとめて追加
+        summaries = [
+            {
                 "conversation_id": f"conv_{i:03d}",
                 "title": f"会話 {i}",
                 "summary": f"サマリー {i}",
@@ -182,7 +161,9 @@ class TestSummaryStorage:
                 "message_count": 1,
                 "created_at": f"2025-12-27T{i:02d}:00:00Z"
             }
-            storage.add_summary(summary, "test_project", max_entries=15)
+            for i in range(20)
+        ]
+        storage.add_summaries(summaries, "test_project", max_entries=15)
 
         summaries = storage.get_summaries("test_project")
         # 15件に制限される
@@ -190,9 +171,32 @@ class TestSummaryStorage:
         # 新しいものが先頭（conv_019が最新）
         assert summaries["entries"][0]["conversation_id"] == "conv_019"
         # 古いもの（conv_004以前）は削除されている
-        ids = [s["conversation_id"] for s in summaries["entries"]]
+        ids = {s["conversation_id"] for s in summaries["entries"]}
         assert "conv_004" not in ids
 
+    def test_add_summary_replaces_existing_when_full(self):
+        """上限に達していても、同じ会話のサマリー更新では他のサマリーを削除しない"""
+        for i in range(3):
+            storage.add_summary({"conversation_id": f"conv_{i}", "message_count": 1}, "test_project", max_entries=3)
+
+        storage.add_summary({"conversation_id": "conv_0", "message_count": 2}, "test_project", max_entries=3)
+
+        ids = [s["conversation_id"] for s in storage.get_summaries("test_project")["entries"]]
+        assert ids == ["conv_0", "conv_2", "conv_1"]
+
+    def test_add_summaries_applies_in_order(self):
+        """まとめて追加しても1件ずつ追加した場合と同じ規則で反映される"""
+        storage.add_summaries([
+            {"conversation_id": "conv_0", "message_count": 1},
+            {"conversation_id": "conv_1", "message_count": 1},
+            {"conversation_id": "conv_0", "message_count": 3},
+            {"conversation_id": "conv_1", "message_count": 1},  # メッセージ数が増えていないので無視
+        ], "test_project")
+
+        entries = storage.get_summaries("test_project")["entries"]
+        assert [(s["conversation_id"], s["message_count"]) for s in entries] == [("conv_0", 3), ("conv_1", 1)]
+        assert all("summarized_at" in s for s in entries)
+
     def test_delete_summary(self):
         """特定のサマリーを削除"""
         for i in range(3):
@@ -213,7 +217,7 @@ class TestSummaryStorage:
 
         summaries = storage.get_summaries("test_project")
         assert len(summaries["entries"]) == 2
-        ids = [s["conversation_id"] for s in summaries["entries"]]
+        ids = {s["conversation_id"] for s in summaries["entries"]}
         assert "conv_1" not in ids
 
         # 存在しないIDの削除
@@ -243,17 +247,6 @@ class TestSummaryStorage:
 class TestProjectIsolation:
     """プロジェクト間のデータ隔離テスト"""
 
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        self.temp_dir = tempfile.mkdtemp()
-        self.original_data_dir = storage.DATA_BASE_DIR
-        storage.DATA_BASE_DIR = self.temp_dir
-        storage._backend = None
-        yield
-        storage.DATA_BASE_DIR = self.original_data_dir
-        storage._backend = None
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
-
     def test_memory_isolation(self):
         """異なるプロジェクトのメモリは分離される"""
         storage.add_memory_entry(
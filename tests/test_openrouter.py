@@ -0,0 +1,447 @@
+"""Unit tests for openrouter module."""
+
+import asyncio
+import gzip
+import json
+import time
+
+import httpx
+import pytest
+
+from backend import llm_cache
+from backend import openrouter
+from backend import tools
+
+
+def _completion(message, usage=None):
+    """OpenRouterのchat completionレスポンスを組み立てる"""
+    return {
+        "choices": [{"message": message}],
+        "usage": usage or {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+@pytest.fixture
+def mock_openrouter(monkeypatch):
+    """OpenRouterへのHTTPリクエストをMockTransportに差し替える
+
+    handler（同期/非同期どちらでも可）を登録すると、
+    各リクエスト(payload dict)に対してレスポンスdict
+    （またはステータス制御用の httpx.Response）を返す
+    """
+    state = {"handler": None, "requests": [], "headers": []}
+
+    async def transport_handler(request: httpx.Request) -> httpx.Response:
+        content = request.content
+        if request.headers.get("Content-Encoding") == "gzip":
+            content = gzip.decompress(content)
+        payload = json.loads(content)
+        state["requests"].append(payload)
+        state["headers"].append(request.headers)
+        result = state["handler"](payload)
+        if asyncio.iscoroutine(result):
+            result = await result
+        if isinstance(result, httpx.Response):
+            return result
+        return httpx.Response(200, json=result)
+
+    transport = httpx.MockTransport(transport_handler)
+    state["clients_created"] = 0
+    async_client_cls = httpx.AsyncClient
+
+    def client_factory(*args, **kwargs):
+        state["clients_created"] += 1
+        return async_client_cls(*args, transport=transport, **kwargs)
+
+    monkeypatch.setattr(openrouter.httpx, "AsyncClient", client_factory)
+    # 共有クライアント・gzip可否・実行中リクエストはテストごとに作り直す
+    monkeypatch.setattr(openrouter, "_client", None)
+    monkeypatch.setattr(openrouter, "_inflight", {})
+    monkeypatch.setattr(openrouter, "_gzip_supported", True)
+    return state
+
+
+async def test_tool_calls_run_concurrently(mock_openrouter, monkeypatch):
+    """同一イテレーション内のツール呼び出しが並行実行され、呼び出し順に返される"""
+    async def slow_tool(name, arguments, tool_logger=None):
+        await asyncio.sleep(0.2)
+        return f"result:{arguments['query']}"
+
+    monkeypatch.setattr(tools, "execute_tool", slow_tool)
+
+    def handler(payload):
+        if payload["messages"][-1]["role"] == "tool":
+            return _completion({"role": "assistant", "content": "done"})
+        return _completion({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{i}",
+                    "type": "function",
+                    "function": {"name": "web_search", "arguments": json.dumps({"query": f"q{i}"})},
+                }
+                for i in range(3)
+            ],
+        })
+
+    mock_openrouter["handler"] = handler
+
+    start = time.perf_counter()
+    result = await openrouter.query_model_with_tools(
+        "test/model",
+        [{"role": "user", "content": "hi"}],
+        tools=tools.AVAILABLE_TOOLS,
+    )
+    elapsed = time.perf_counter() - start
+
+    assert result["content"] == "done"
+    assert elapsed < 0.5  # 逐次実行なら0.6秒以上かかる
+
+    tool_messages = [m for m in mock_openrouter["requests"][-1]["messages"] if m["role"] == "tool"]
+    assert [m["tool_call_id"] for m in tool_messages] == ["call_0", "call_1", "call_2"]
+    assert [m["content"] for m in tool_messages] == ["result:q0", "result:q1", "result:q2"]
+    assert [t["arguments"]["query"] for t in result["tools_used"]] == ["q0", "q1", "q2"]
+
+
+async def test_members_parallel_cancels_after_quorum(mock_openrouter):
+    """クォーラム到達後、遅いメンバーはキャンセルされNoneになる"""
+    async def handler(payload):
+        if payload["model"] == "slow/model":
+            await asyncio.sleep(5)
+        return _completion({"role": "assistant", "content": payload["model"]})
+
+    mock_openrouter["handler"] = handler
+    members = [
+        {"id": "a", "model": "fast/a"},
+        {"id": "b", "model": "fast/b"},
+        {"id": "slow", "model": "slow/model"},
+    ]
+
+    start = time.perf_counter()
+    responses = await openrouter.query_members_parallel(
+        members,
+        [{"role": "user", "content": "hi"}],
+        quorum_ratio=0.6,
+    )
+
+    assert time.perf_counter() - start < 1.0
+    assert responses["a"]["content"] == "fast/a"
+    assert responses["b"]["content"] == "fast/b"
+    assert responses["slow"] is None
+
+
+async def test_members_parallel_soft_timeout(mock_openrouter):
+    """ソフトタイムアウト経過後は揃った分だけを返す"""
+    async def handler(payload):
+        if payload["model"] == "slow/model":
+            await asyncio.sleep(5)
+        return _completion({"role": "assistant", "content": "ok"})
+
+    mock_openrouter["handler"] = handler
+    members = [
+        {"id": "fast", "model": "fast/a"},
+        {"id": "slow", "model": "slow/model"},
+    ]
+
+    responses = await openrouter.query_members_parallel(
+        members,
+        [{"role": "user", "content": "hi"}],
+        soft_timeout_s=0.2,
+    )
+
+    assert responses["fast"]["content"] == "ok"
+    assert responses["slow"] is None
+
+
+async def test_query_model_retries_on_429_with_retry_after(mock_openrouter):
+    """429はRetry-Afterに従って再試行される"""
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return _completion({"role": "assistant", "content": "ok"})
+
+    mock_openrouter["handler"] = handler
+
+    result = await openrouter.query_model("test/model", [{"role": "user", "content": "hi"}])
+
+    assert result["content"] == "ok"
+    assert len(calls) == 2
+
+
+async def test_query_model_gives_up_after_max_attempts(mock_openrouter, monkeypatch):
+    """再試行回数の上限に達したらNoneを返す"""
+    monkeypatch.setattr(openrouter, "RETRY_BACKOFF_INITIAL_S", 0.0)
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        return httpx.Response(503)
+
+    mock_openrouter["handler"] = handler
+
+    result = await openrouter.query_model("test/model", [{"role": "user", "content": "hi"}])
+
+    assert result is None
+    assert len(calls) == openrouter.MAX_RETRY_ATTEMPTS
+
+
+async def test_query_model_does_not_retry_client_errors(mock_openrouter):
+    """400系（429以外）は再試行しない"""
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        return httpx.Response(400)
+
+    mock_openrouter["handler"] = handler
+
+    result = await openrouter.query_model("test/model", [{"role": "user", "content": "hi"}])
+
+    assert result is None
+    assert len(calls) == 1
+
+
+async def test_members_with_same_model_are_batched(mock_openrouter):
+    """同一model/system_promptのメンバーはn指定の1リクエストにまとめられる"""
+    def handler(payload):
+        n = payload.get("n", 1)
+        return {
+            "choices": [{"message": {"role": "assistant", "content": f"{payload['model']}#{i}"}} for i in range(n)],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 21, "total_tokens": 31},
+        }
+
+    mock_openrouter["handler"] = handler
+    members = [
+        {"id": "v1", "model": "same/model"},
+        {"id": "v2", "model": "same/model"},
+        {"id": "other", "model": "other/model"},
+    ]
+
+    responses = await openrouter.query_members_parallel(members, [{"role": "user", "content": "hi"}])
+
+    assert len(mock_openrouter["requests"]) == 2
+    batched = [r for r in mock_openrouter["requests"] if r["model"] == "same/model"]
+    assert batched[0]["n"] == 2
+    assert "n" not in [r for r in mock_openrouter["requests"] if r["model"] == "other/model"][0]
+    assert responses["v1"]["content"] == "same/model#0"
+    assert responses["v2"]["content"] == "same/model#1"
+    assert responses["other"]["content"] == "other/model#0"
+    # 使用量は按分される（端数は先頭）
+    assert responses["v1"]["usage"]["completion_tokens"] == 11
+    assert responses["v2"]["usage"]["completion_tokens"] == 10
+    assert list(responses) == ["v1", "v2", "other"]
+
+
+async def test_query_model_n_falls_back_when_n_is_ignored(mock_openrouter):
+    """プロバイダーがnを無視した場合、不足分は個別リクエストで補う"""
+    def handler(payload):
+        return _completion({"role": "assistant", "content": "n" if "n" in payload else "single"})
+
+    mock_openrouter["handler"] = handler
+
+    results = await openrouter.query_model_n("test/model", [{"role": "user", "content": "hi"}], n=3)
+
+    assert [r["content"] for r in results] == ["n", "single", "single"]
+    assert len(mock_openrouter["requests"]) == 3
+
+
+async def test_auth_headers_come_from_shared_client(mock_openrouter, monkeypatch):
+    """認証ヘッダーとContent-Typeは共有クライアントから送られる"""
+    monkeypatch.setattr(openrouter, "OPENROUTER_API_KEY", "test-key")
+    mock_openrouter["handler"] = lambda payload: _completion({"role": "assistant", "content": "ok"})
+
+    await openrouter.query_model("test/model", [{"role": "user", "content": "hi"}])
+
+    headers = mock_openrouter["headers"][0]
+    assert headers["Authorization"] == "Bearer test-key"
+    assert headers["Content-Type"] == "application/json"
+
+
+async def test_large_request_body_is_gzipped(mock_openrouter):
+    """閾値を超えるボディのみgzip圧縮して送る"""
+    mock_openrouter["handler"] = lambda payload: _completion({"role": "assistant", "content": "ok"})
+
+    await openrouter.query_model("test/model", [{"role": "user", "content": "hi"}])
+    await openrouter.query_model("test/model", [{"role": "user", "content": "x" * openrouter.GZIP_MIN_BYTES}])
+
+    assert "Content-Encoding" not in mock_openrouter["headers"][0]
+    assert mock_openrouter["headers"][1]["Content-Encoding"] == "gzip"
+    assert len(mock_openrouter["requests"][1]["messages"][0]["content"]) == openrouter.GZIP_MIN_BYTES
+
+
+async def test_gzip_falls_back_on_415(mock_openrouter):
+    """415が返された場合は無圧縮で送り直し、以降は圧縮しない"""
+    def handler(payload):
+        if mock_openrouter["headers"][-1].get("Content-Encoding") == "gzip":
+            return httpx.Response(415)
+        return _completion({"role": "assistant", "content": "ok"})
+
+    mock_openrouter["handler"] = handler
+    messages = [{"role": "user", "content": "x" * openrouter.GZIP_MIN_BYTES}]
+
+    first = await openrouter.query_model("test/model", messages)
+    second = await openrouter.query_model("test/model", messages)
+
+    assert first["content"] == second["content"] == "ok"
+    assert [h.get("Content-Encoding") for h in mock_openrouter["headers"]] == ["gzip", None, None]
+
+
+async def test_gzip_falls_back_on_400(mock_openrouter):
+    """gzipボディに400が返され無圧縮なら通る場合は、以降は圧縮しない"""
+    def handler(payload):
+        if mock_openrouter["headers"][-1].get("Content-Encoding") == "gzip":
+            return httpx.Response(400)
+        return _completion({"role": "assistant", "content": "ok"})
+
+    mock_openrouter["handler"] = handler
+    messages = [{"role": "user", "content": "x" * openrouter.GZIP_MIN_BYTES}]
+
+    first = await openrouter.query_model("test/model", messages)
+    second = await openrouter.query_model("test/model", messages)
+
+    assert first["content"] == second["content"] == "ok"
+    assert [h.get("Content-Encoding") for h in mock_openrouter["headers"]] == ["gzip", None, None]
+
+
+async def test_unrelated_400_keeps_gzip_enabled(mock_openrouter):
+    """無圧縮でも400になる不正リクエストはエラーのままで、圧縮は続ける"""
+    mock_openrouter["handler"] = lambda payload: httpx.Response(400)
+    messages = [{"role": "user", "content": "x" * openrouter.GZIP_MIN_BYTES}]
+
+    assert await openrouter.query_model("test/model", messages) is None
+
+    assert [h.get("Content-Encoding") for h in mock_openrouter["headers"]] == ["gzip", None]
+    assert openrouter._gzip_supported is True
+
+
+async def test_identical_inflight_requests_are_coalesced(mock_openrouter):
+    """実行中の同一リクエストは1回のAPI呼び出しにまとめられ、使用量は1回分だけ計上される"""
+    async def handler(payload):
+        await asyncio.sleep(0.1)
+        return _completion({"role": "assistant", "content": "shared"})
+
+    mock_openrouter["handler"] = handler
+    messages = [{"role": "user", "content": "hi"}]
+
+    results = await asyncio.gather(*[openrouter.query_model("test/model", messages) for _ in range(3)])
+
+    assert len(mock_openrouter["requests"]) == 1
+    assert [r["content"] for r in results] == ["shared"] * 3
+    assert [r["usage"]["total_tokens"] for r in results] == [2, 0, 0]
+    assert [r.get("coalesced", False) for r in results] == [False, True, True]
+    assert openrouter._inflight == {}
+
+
+async def test_coalesced_request_survives_one_waiter_cancelling(mock_openrouter):
+    """待機者の一人がキャンセルされても、残りの待機者は結果を受け取れる"""
+    async def handler(payload):
+        await asyncio.sleep(0.2)
+        return _completion({"role": "assistant", "content": "ok"})
+
+    mock_openrouter["handler"] = handler
+    messages = [{"role": "user", "content": "hi"}]
+
+    first = asyncio.create_task(openrouter.query_model("test/model", messages))
+    second = asyncio.create_task(openrouter.query_model("test/model", messages))
+    await asyncio.sleep(0.05)
+    first.cancel()
+
+    assert (await second)["content"] == "ok"
+    assert first.cancelled()
+    assert len(mock_openrouter["requests"]) == 1
+
+
+async def test_tool_loop_reuses_shared_client(mock_openrouter, monkeypatch):
+    """ツールループの全イテレーションで共有クライアントが再利用される"""
+    async def fake_tool(name, arguments, tool_logger=None):
+        return "result"
+
+    monkeypatch.setattr(tools, "execute_tool", fake_tool)
+
+    def handler(payload):
+        # 常にツール呼び出しを返し、最大イテレーションまで回す
+        if "tools" not in payload:
+            return _completion({"role": "assistant", "content": "final"})
+        return _completion({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": "call",
+                "type": "function",
+                "function": {"name": "web_search", "arguments": "{}"},
+            }],
+        })
+
+    mock_openrouter["handler"] = handler
+
+    result = await openrouter.query_model_with_tools(
+        "test/model",
+        [{"role": "user", "content": "hi"}],
+        tools=tools.AVAILABLE_TOOLS,
+        max_tool_iterations=5,
+    )
+
+    assert result["content"] == "final"
+    assert len(mock_openrouter["requests"]) == 6  # 5イテレーション + 最終回答
+    assert mock_openrouter["clients_created"] == 1
+
+
+async def test_members_parallel_propagates_caller_cancellation(mock_openrouter):
+    """呼び出し元がキャンセルされると実行中のメンバーリクエストもキャンセルされる"""
+    cancelled = []
+
+    async def handler(payload):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(payload["model"])
+            raise
+        return _completion({"role": "assistant", "content": "late"})
+
+    mock_openrouter["handler"] = handler
+    members = [{"id": "a", "model": "slow/a"}, {"id": "b", "model": "slow/b"}]
+
+    task = asyncio.create_task(
+        openrouter.query_members_parallel(members, [{"role": "user", "content": "hi"}])
+    )
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert sorted(cancelled) == ["slow/a", "slow/b"]
+
+
+def test_parse_args_normalizes_tool_arguments(caplog):
+    """ツール引数はdict/文字列/バイト列を受け付け、不正な値は警告付きで空dictになる"""
+    assert openrouter._parse_args({"query": "a"}) == {"query": "a"}
+    assert openrouter._parse_args('{"query": "b"}') == {"query": "b"}
+    assert openrouter._parse_args(b'{"query": "c"}') == {"query": "c"}
+    assert openrouter._parse_args("") == {}
+    assert openrouter._parse_args(None) == {}
+
+    with caplog.at_level("WARNING"):
+        assert openrouter._parse_args("{broken") == {}
+        assert openrouter._parse_args("[1, 2]") == {}
+    assert "Malformed tool arguments" in caplog.text
+
+
+async def test_query_model_uses_response_cache(mock_openrouter, monkeypatch, tmp_path):
+    """COUNCIL_CACHE有効時、同一リクエストはキャッシュから返される"""
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    mock_openrouter["handler"] = lambda payload: _completion({"role": "assistant", "content": "fresh"})
+    messages = [{"role": "user", "content": "hi"}]
+
+    first = await openrouter.query_model("test/model", messages)
+    second = await openrouter.query_model("test/model", messages)
+
+    assert len(mock_openrouter["requests"]) == 1
+    assert first["content"] == second["content"] == "fresh"
+    assert second["cached"] is True
+    assert second["usage"]["total_tokens"] == 0
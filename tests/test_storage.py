@@ -0,0 +1,771 @@
+"""ストレージ層の単体テスト"""
+
+import copy
+import importlib.util
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from backend import storage
+
+
+@pytest.fixture(autouse=True)
+def local_storage(request, data_dir, monkeypatch):
+    """テストごとのデータディレクトリをローカルストレージの保存先にする"""
+    monkeypatch.setattr(storage, "DATA_BASE_DIR", data_dir)
+    monkeypatch.setattr(storage, "_backend", None)
+    storage._clear_cache()
+    if request.instance is not None:
+        request.instance.temp_dir = data_dir
+    yield data_dir
+    storage.flush()
+    storage._clear_cache()
+
+
+class TestLocalStorageCache:
+    """パース済みJSONキャッシュのテスト"""
+
+    def _conv_path(self, conversation_id):
+        return os.path.join(self.temp_dir, "projects", "p", "conversations", f"{conversation_id}.json")
+
+    def test_cached_read_skips_parse(self, monkeypatch):
+        """変更のないファイルは再パースしない"""
+        storage.create_conversation("c1", "p")
+        storage.get_conversation("c1", "p")
+
+        def fail_loads(*args, **kwargs):
+            raise AssertionError("orjson.loads should not be called")
+
+        monkeypatch.setattr(storage.orjson, "loads", fail_loads)
+        assert storage.get_conversation("c1", "p")["id"] == "c1"
+
+    def test_large_file_is_read_via_mmap(self, monkeypatch):
+        """しきい値以上のファイルはmmapで読み、内容は通常の読み込みと同じ"""
+        storage.create_conversation("c1", "p")
+        storage.add_user_message("c1", "こんにちは", "p")
+        expected = storage.get_conversation("c1", "p")
+        storage._clear_cache()
+
+        mapped = []
+        original = storage._load_mapped_json
+        monkeypatch.setattr(storage, "MMAP_MIN_BYTES", 1)
+        monkeypatch.setattr(storage, "_load_mapped_json", lambda path: mapped.append(path) or original(path))
+
+        assert storage.get_conversation("c1", "p") == expected
+        assert self._conv_path("c1") in mapped
+
+    def test_returned_dict_is_a_copy(self):
+        """呼び出し側で書き換えてもキャッシュに影響しない"""
+        storage.create_conversation("c1", "p")
+        conversation = storage.get_conversation("c1", "p")
+        conversation["messages"].append({"role": "user", "content": "unsaved"})
+
+        assert storage.get_conversation("c1", "p")["messages"] == []
+
+    def test_external_modification_is_detected(self):
+        """ファイルが外部で書き換えられたら読み直す"""
+        storage.create_conversation("c1", "p")
+        storage.get_conversation("c1", "p")
+
+        path = self._conv_path("c1")
+        with open(path, 'r') as f:
+            data = json.load(f)
+        data["title"] = "Edited elsewhere"
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        # mtimeの粒度に依存しないよう明示的に進める
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+        assert storage.get_conversation("c1", "p")["title"] == "Edited elsewhere"
+
+    def test_deleted_file_is_not_served_from_cache(self):
+        """削除済みのファイルはキャッシュから返さない"""
+        storage.create_conversation("c1", "p")
+        storage.get_conversation("c1", "p")
+        storage.delete_conversation("c1", "p")
+
+        assert storage.get_conversation("c1", "p") is None
+
+    def test_legacy_indented_files_are_readable(self):
+        """json.dump(indent=2) で書かれた既存ファイルも読める"""
+        storage.create_conversation("c1", "p")
+        path = self._conv_path("c1")
+        with open(path, 'w') as f:
+            json.dump({"id": "c1", "created_at": "2024-01-01T00:00:00", "title": "旧形式", "messages": []}, f, indent=2)
+
+        assert storage.get_conversation("c1", "p")["title"] == "旧形式"
+
+    def test_cache_is_bounded(self, monkeypatch):
+        """上限を超えたら古いエントリから追い出す"""
+        monkeypatch.setattr(storage, "PARSE_CACHE_MAX_ENTRIES", 2)
+        for i in range(3):
+            storage.create_conversation(f"c{i}", "p")
+
+        assert len(storage._parse_cache) == 2
+        assert self._conv_path("c0") not in storage._parse_cache
+        assert self._conv_path("c2") in storage._parse_cache
+
+
+class TestConversationIndex:
+    """会話一覧インデックスのテスト"""
+
+    def _index_path(self):
+        return os.path.join(self.temp_dir, "projects", "p", "conversations", storage.CONVERSATION_INDEX_FILENAME)
+
+    def test_index_tracks_create_save_delete(self):
+        """作成・保存・削除がインデックスに反映される"""
+        storage.create_conversation("c1", "p")
+        storage.create_conversation("c2", "p")
+        storage.add_user_message("c1", "hello", "p")
+        storage.update_conversation_title("c1", "Greeting", "p")
+        storage.delete_conversation("c2", "p")
+
+        with open(self._index_path()) as f:
+            index = json.load(f)
+        assert index["conversations"] == {
+            "c1": {
+                "id": "c1",
+                "created_at": index["conversations"]["c1"]["created_at"],
+                "title": "Greeting",
+                "message_count": 1,
+            }
+        }
+
+    def test_list_reads_only_index(self, monkeypatch):
+        """インデックスがあれば会話ファイルは読まない"""
+        storage.create_conversation("c1", "p")
+        storage._parse_cache.clear()
+        loaded = []
+        original = storage._cached_load_json
+
+        def tracking_load(path, copy_result=True):
+            loaded.append(os.path.basename(path))
+            return original(path, copy_result)
+
+        monkeypatch.setattr(storage, "_cached_load_json", tracking_load)
+
+        assert [c["id"] for c in storage.list_conversations("p")] == ["c1"]
+        assert loaded == [storage.CONVERSATION_INDEX_FILENAME]
+
+    def test_list_projects_ignores_files(self):
+        """projects直下のファイルはプロジェクトとして扱わない"""
+        storage.create_project("a")
+        storage.create_project("b")
+        with open(os.path.join(self.temp_dir, "projects", "stray.json"), 'w') as f:
+            f.write("{}")
+
+        assert storage.list_projects() == ["a", "b"]
+
+    def test_missing_index_is_rebuilt(self):
+        """インデックスがない旧データは全件スキャンで作り直す"""
+        storage.create_conversation("c1", "p")
+        storage.add_user_message("c1", "hello", "p")
+        os.remove(self._index_path())
+
+        conversations = storage.list_conversations("p")
+
+        assert [(c["id"], c["message_count"]) for c in conversations] == [("c1", 1)]
+        assert os.path.exists(self._index_path())
+
+    def test_unchanged_listing_fields_skip_index_write(self, monkeypatch):
+        """一覧に出す項目が変わらない更新ではインデックスを書き直さない"""
+        storage.create_conversation("c1", "p")
+        storage.update_conversation_title("c1", "Greeting", "p")
+        writes = []
+        original = storage.LocalStorage._write_index
+        monkeypatch.setattr(
+            storage.LocalStorage, "_write_index",
+            lambda self, *args, **kwargs: writes.append(args[0]) or original(self, *args, **kwargs)
+        )
+
+        storage.update_conversation_title("c1", "Greeting", "p")
+        assert writes == []
+        storage.add_user_message("c1", "hello", "p")
+        assert writes == ["p"]
+
+    def test_returned_list_does_not_alias_cached_index(self):
+        """一覧の結果を書き換えてもインデックスのキャッシュは変わらない"""
+        storage.create_conversation("c1", "p")
+        storage.add_user_message("c1", "hello", "p")
+        storage.list_conversations("p")[0]["title"] = "changed"
+
+        assert storage.list_conversations("p")[0]["title"] == "New Conversation"
+
+    def test_index_lock_is_per_project(self):
+        """別プロジェクトのインデックス更新中でも待たされない"""
+        storage.create_conversation("c1", "p")
+        backend = storage._get_backend()
+        done = threading.Event()
+
+        with backend._index_lock("q"):
+            worker = threading.Thread(target=lambda: (storage.add_user_message("c1", "hello", "p"), done.set()))
+            worker.start()
+            assert done.wait(2)
+        worker.join()
+
+
+class TestMemoryLog:
+    """メモリの追記ログのテスト"""
+
+    def _project_path(self, filename):
+        return os.path.join(self.temp_dir, "projects", "p", filename)
+
+    def _log_lines(self):
+        with open(self._project_path("memory.jsonl"), 'rb') as f:
+            return f.read().splitlines()
+
+    def test_add_appends_one_line(self):
+        """追加は1行の追記になる"""
+        storage.add_memory_entry({"key": "a", "value": "1"}, "p")
+        before = self._log_lines()
+        storage.add_memory_entry({"key": "b", "value": "2"}, "p")
+        after = self._log_lines()
+
+        assert after[:len(before)] == before
+        assert len(after) == len(before) + 1
+
+    def test_bulk_add_appends_once(self):
+        """まとめて追加すると1回の追記で全エントリが書き込まれ、日時も揃う"""
+        storage.add_memory_entry({"key": "a", "value": "1"}, "p")
+        before = self._log_lines()
+
+        added = storage.add_memory_entries([{"key": "b", "value": "2"}, {"key": "c", "value": "3"}], "p")
+
+        assert len(self._log_lines()) == len(before) + 2
+        assert all(e["id"].startswith("mem_") for e in added)
+        assert added[0]["extracted_at"] == added[1]["extracted_at"]
+        assert [e["key"] for e in storage.get_memory("p")["entries"]] == ["a", "b", "c"]
+
+    def test_log_is_folded_on_read(self):
+        """更新・削除は読み込み時に反映される（キャッシュなしでも同じ結果）"""
+        a = storage.add_memory_entry({"key": "a", "value": "1"}, "p")
+        b = storage.add_memory_entry({"key": "b", "value": "2"}, "p")
+        storage.add_memory_entry({"key": "c", "value": "3"}, "p")
+        storage.update_memory_entry(a["id"], {"value": "updated"}, "p")
+        storage.delete_memory_entry(b["id"], "p")
+        storage._parse_cache.clear()
+
+        memory = storage.get_memory("p")
+        assert [(e["key"], e["value"]) for e in memory["entries"]] == [("a", "updated"), ("c", "3")]
+
+    def test_update_after_delete_targets_right_entry(self):
+        """削除で位置がずれた後も正しいエントリを更新できる"""
+        entries = [storage.add_memory_entry({"key": str(i), "value": "v"}, "p") for i in range(4)]
+        storage.delete_memory_entry(entries[1]["id"], "p")
+
+        updated = storage.update_memory_entry(entries[3]["id"], {"value": "w"}, "p")
+
+        assert updated["key"] == "3"
+        assert [(e["key"], e["value"]) for e in storage.get_memory("p")["entries"]] == [
+            ("0", "v"), ("2", "v"), ("3", "w")
+        ]
+        assert storage.update_memory_entry(entries[1]["id"], {"value": "x"}, "p") is None
+
+    def test_log_is_compacted(self):
+        """更新・削除がエントリ数の半分を超えたら書き直される"""
+        entries = [storage.add_memory_entry({"key": str(i), "value": "v"}, "p") for i in range(4)]
+        for entry in entries[:3]:
+            storage.update_memory_entry(entry["id"], {"value": "w"}, "p")
+
+        # ヘッダー + エントリ4件のみに圧縮されている
+        assert len(self._log_lines()) == 5
+        assert [e["value"] for e in storage.get_memory("p")["entries"]] == ["w", "w", "w", "v"]
+
+    def test_truncated_last_line_is_ignored(self):
+        """書き込み途中で途切れた末尾行は無視する"""
+        storage.add_memory_entry({"key": "a", "value": "1"}, "p")
+        with open(self._project_path("memory.jsonl"), 'ab') as f:
+            f.write(b'\n{"op": "add", "entry": {"id": "mem_x", "ke')
+
+        assert [e["key"] for e in storage.get_memory("p")["entries"]] == ["a"]
+
+        # 途切れた行の後の追記も正しく読める
+        storage.add_memory_entry({"key": "b", "value": "2"}, "p")
+        storage._parse_cache.clear()
+        assert [e["key"] for e in storage.get_memory("p")["entries"]] == ["a", "b"]
+
+    def test_legacy_memory_json_is_migrated(self):
+        """旧形式のmemory.jsonは読めて、最初の変更時に移行される"""
+        os.makedirs(self._project_path(""), exist_ok=True)
+        legacy = {
+            "version": 1,
+            "created_at": "2024-01-01T00:00:00",
+            "updated_at": "2024-01-01T00:00:00",
+            "entries": [{"id": "mem_old", "key": "old", "value": "v"}]
+        }
+        with open(self._project_path("memory.json"), 'w') as f:
+            json.dump(legacy, f)
+
+        assert storage.get_memory("p")["entries"][0]["key"] == "old"
+
+        storage.add_memory_entry({"key": "new", "value": "v"}, "p")
+
+        assert not os.path.exists(self._project_path("memory.json"))
+        memory = storage.get_memory("p")
+        assert memory["created_at"] == "2024-01-01T00:00:00"
+        assert [e["key"] for e in memory["entries"]] == ["old", "new"]
+
+
+class TestAtomicWrite:
+    """アトミックな書き込みのテスト"""
+
+    def test_failed_write_keeps_original(self, monkeypatch):
+        """書き込み途中で失敗しても元のファイルは残り、一時ファイルも消える"""
+        path = os.path.join(self.temp_dir, "config.json")
+        storage._atomic_write_json(path, {"version": 1})
+
+        def failing_replace(src, dst):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(storage.os, "replace", failing_replace)
+        with pytest.raises(OSError):
+            storage._atomic_write_json(path, {"version": 2})
+
+        with open(path) as f:
+            assert json.load(f) == {"version": 1}
+        assert os.listdir(self.temp_dir) == ["config.json"]
+
+    def test_fsync_only_when_durable(self, monkeypatch):
+        """STORAGE_DURABLE有効時のみfsyncする"""
+        calls = []
+        monkeypatch.setattr(storage.os, "fsync", lambda fd: calls.append(fd))
+        path = os.path.join(self.temp_dir, "config.json")
+
+        storage._atomic_write_json(path, {})
+        assert calls == []
+
+        monkeypatch.setattr(storage, "STORAGE_DURABLE", True)
+        storage._atomic_write_json(path, {"version": 1})
+        assert len(calls) == 1
+
+    def test_path_locks_are_released_after_use(self):
+        """書き込み後にパスごとのロックは残らない"""
+        for i in range(10):
+            storage.create_conversation(f"c{i}", "p")
+
+        assert not [path for path in storage._path_locks.keys() if path.startswith(self.temp_dir)]
+
+    def test_path_lock_is_shared_while_in_use(self):
+        """使用中は同じパスに同じロックを返す"""
+        lock = storage._path_lock("x")
+        assert storage._path_lock("x") is lock
+
+    def test_unchanged_write_is_skipped(self, monkeypatch):
+        """内容が変わらない書き込みは省略し、外部で変更された場合は書き込む"""
+        path = os.path.join(self.temp_dir, "config.json")
+        storage._atomic_write_json(path, {"version": 1}, indent=True)
+
+        replaced = []
+        original_replace = os.replace
+        monkeypatch.setattr(storage.os, "replace", lambda src, dst: (replaced.append(dst), original_replace(src, dst)))
+
+        storage._atomic_write_json(path, {"version": 1}, indent=True)
+        assert replaced == []
+
+        with open(path, "w") as f:
+            f.write('{"version": 0}')
+        storage._atomic_write_json(path, {"version": 1}, indent=True)
+        assert replaced == [path]
+        with open(path) as f:
+            assert json.load(f) == {"version": 1}
+
+    def test_reads_and_noop_updates_do_not_write(self):
+        """空の読み込みや対象のない更新・削除ではファイルを作らない"""
+        assert storage.get_memory("p")["entries"] == []
+        assert storage.get_summaries("p")["entries"] == []
+        assert storage.update_memory_entry("missing", {"value": "v"}, "p") is None
+        assert storage.delete_memory_entry("missing", "p") is False
+        assert storage.delete_summary("missing", "p") is False
+
+        assert [files for _, _, files in os.walk(self.temp_dir) if files] == []
+
+
+class TestNowIso:
+    """タイムスタンプ文字列のテスト"""
+
+    def test_matches_datetime_isoformat(self, monkeypatch):
+        """datetime.isoformat() と同じ形式で、マイクロ秒まで保つ"""
+        now = [1_700_000_000_123_456_789]
+        monkeypatch.setattr(storage.time, "time_ns", lambda: now[0])
+
+        assert storage._now_iso() == "2023-11-14T22:13:20.123456"
+        now[0] += 1_000
+        assert storage._now_iso() == "2023-11-14T22:13:20.123457"
+        now[0] = 1_700_000_001_000_000_000
+        assert storage._now_iso() == "2023-11-14T22:13:21"
+
+    def test_back_to_back_conversations_keep_creation_order(self):
+        """続けて作った会話も作成日時で順序が決まる"""
+        for i in range(5):
+            storage.create_conversation(f"c{i}", "p")
+            time.sleep(0.001)
+
+        assert [c["id"] for c in storage.list_conversations("p")] == ["c4", "c3", "c2", "c1", "c0"]
+
+
+@pytest.mark.skipif(storage.ijson is None, reason="ijson is not installed")
+def test_read_conversation_meta_matches_full_parse(tmp_path):
+    """ストリーミングで読んだメタデータが全体パースの結果と一致する"""
+    conversation = {
+        "id": "c1",
+        "created_at": "2025-01-01T00:00:00",
+        "title": "タイトル",
+        "messages": [
+            {"role": "user", "content": "q", "title": "nested title is ignored"},
+            {"role": "assistant", "stage1": [{"model": "m", "response": "r"}], "stage2": [], "stage3": {}},
+        ],
+    }
+    path = tmp_path / "c1.json"
+    path.write_bytes(storage._dumps(conversation))
+
+    expected = {**storage._index_record(conversation), "log_seq": 0}
+    assert storage._read_conversation_meta(str(path)) == expected
+
+
+@pytest.mark.skipif(importlib.util.find_spec("zstandard") is None, reason="zstandard is not installed")
+class TestConversationCompression:
+    """会話ファイルのzstd圧縮のテスト"""
+
+    def _conv_path(self, conversation_id):
+        return os.path.join(self.temp_dir, "projects", "p", "conversations", f"{conversation_id}.json")
+
+    def test_compressed_roundtrip(self, monkeypatch):
+        """圧縮有効時は .json.zst に保存され、そのまま読める"""
+        monkeypatch.setattr(storage, "STORAGE_COMPRESS", "zstd")
+        storage.create_conversation("c1", "p")
+        storage.add_user_message("c1", "こんにちは" * 100, "p")
+        storage._parse_cache.clear()
+
+        assert os.path.exists(self._conv_path("c1") + ".zst")
+        assert not os.path.exists(self._conv_path("c1"))
+        assert storage.get_conversation("c1", "p")["messages"][0]["content"] == "こんにちは" * 100
+
+    def test_switching_format_keeps_conversations_readable(self, monkeypatch):
+        """保存形式を切り替えても既存の会話を読め、次の保存で新形式に移行する"""
+        storage.create_conversation("c1", "p")
+        monkeypatch.setattr(storage, "STORAGE_COMPRESS", "zstd")
+
+        conversation = storage.get_conversation("c1", "p")
+        conversation["title"] = "Compressed"
+        storage.save_conversation(conversation, "p")
+
+        assert not os.path.exists(self._conv_path("c1"))
+        monkeypatch.setattr(storage, "STORAGE_COMPRESS", "")
+        assert storage.get_conversation("c1", "p")["title"] == "Compressed"
+
+    def test_index_rebuild_reads_compressed_files(self, monkeypatch):
+        """インデックス再構築時に圧縮ファイルも読み込む"""
+        monkeypatch.setattr(storage, "STORAGE_COMPRESS", "zstd")
+        storage.create_conversation("c1", "p")
+        os.remove(os.path.join(self.temp_dir, "projects", "p", "conversations", storage.CONVERSATION_INDEX_FILENAME))
+
+        assert [c["id"] for c in storage.list_conversations("p")] == ["c1"]
+
+    def test_delete_removes_compressed_file(self, monkeypatch):
+        """圧縮ファイルも削除できる"""
+        monkeypatch.setattr(storage, "STORAGE_COMPRESS", "zstd")
+        storage.create_conversation("c1", "p")
+
+        assert storage.delete_conversation("c1", "p") is True
+        assert storage.get_conversation("c1", "p") is None
+
+
+class TestConversationLog:
+    """会話の追記ログのテスト"""
+
+    def _path(self, filename):
+        return os.path.join(self.temp_dir, "projects", "p", "conversations", filename)
+
+    def _read_bytes(self, filename):
+        with open(self._path(filename), 'rb') as f:
+            return f.read()
+
+    def _seed(self, message_count=10):
+        """ログより本体が大きくなるよう、本体に長めの履歴を書いておく"""
+        storage.create_conversation("c1", "p")
+        conversation = storage.get_conversation("c1", "p")
+        conversation["messages"] = [{"role": "user", "content": "x" * 200} for _ in range(message_count)]
+        storage.save_conversation(conversation, "p")
+
+    def test_append_does_not_copy_existing_log_records(self, monkeypatch):
+        """追記のたびに既存のログ全体をコピーしない（追記のコストがログ長に比例しない）"""
+        self._seed(message_count=50)
+        for i in range(20):
+            storage.add_user_message("c1", f"m{i}", "p")
+        existing = storage._parse_cache[self._path("c1.log.jsonl")][2]
+        assert len(existing) == 20
+
+        copied = []
+        original_deepcopy = copy.deepcopy
+        monkeypatch.setattr(storage.copy, "deepcopy", lambda obj, *args: copied.append(obj) or original_deepcopy(obj, *args))
+        storage.add_user_message("c1", "last", "p")
+
+        existing_ids = {id(r) for r in existing}
+        for obj in copied:
+            assert id(obj) not in existing_ids
+            assert not (isinstance(obj, list) and any(id(r) in existing_ids for r in obj))
+        assert len(storage._parse_cache[self._path("c1.log.jsonl")][2]) == 21
+        assert storage.get_conversation("c1", "p")["messages"][-1]["content"] == "last"
+
+    def test_messages_are_appended_without_rewriting_snapshot(self):
+        """メッセージ追加・タイトル変更は本体を書き直さずログに追記する"""
+        self._seed()
+        snapshot = self._read_bytes("c1.json")
+
+        storage.add_user_message("c1", "hello", "p")
+        storage.update_conversation_title("c1", "Greeting", "p")
+
+        assert self._read_bytes("c1.json") == snapshot
+        assert len(self._read_bytes("c1.log.jsonl").splitlines()) == 3  # 先頭は空行
+        storage._parse_cache.clear()
+        conversation = storage.get_conversation("c1", "p")
+        assert conversation["title"] == "Greeting"
+        assert conversation["messages"][-1] == {"role": "user", "content": "hello"}
+        assert "log_seq" not in conversation
+
+    def test_log_is_folded_when_larger_than_snapshot(self):
+        """ログが本体より大きくなったら本体に畳み込まれる"""
+        storage.create_conversation("c1", "p")
+        for i in range(3):
+            storage.add_user_message("c1", f"message {i}" * 10, "p")
+
+        assert not os.path.exists(self._path("c1.log.jsonl"))
+        storage._parse_cache.clear()
+        assert len(storage.get_conversation("c1", "p")["messages"]) == 3
+
+    def test_stale_log_after_save_is_not_applied_twice(self):
+        """本体保存後にログ削除前に落ちた場合でも、メッセージは二重にならない"""
+        self._seed()
+        storage.add_user_message("c1", "hello", "p")
+        stale_log = self._read_bytes("c1.log.jsonl")
+
+        storage.save_conversation(storage.get_conversation("c1", "p"), "p")
+        with open(self._path("c1.log.jsonl"), 'wb') as f:
+            f.write(stale_log)
+        storage._parse_cache.clear()
+
+        messages = storage.get_conversation("c1", "p")["messages"]
+        assert [m["content"] for m in messages].count("hello") == 1
+
+    def test_index_rebuild_includes_logged_messages(self):
+        """インデックス再構築時もログの内容を反映する"""
+        self._seed(message_count=2)
+        storage.add_user_message("c1", "hello", "p")
+        storage.update_conversation_title("c1", "Greeting", "p")
+        os.remove(self._path(storage.CONVERSATION_INDEX_FILENAME))
+
+        conversations = storage.list_conversations("p")
+
+        assert [(c["title"], c["message_count"]) for c in conversations] == [("Greeting", 3)]
+
+    def test_missing_conversation_raises(self):
+        """存在しない会話への追記はValueError"""
+        with pytest.raises(ValueError):
+            storage.add_user_message("missing", "hello", "p")
+        assert not os.path.exists(self._path("missing.log.jsonl"))
+
+
+def test_get_backend_creates_single_instance_under_concurrency(monkeypatch):
+    """初回の同時アクセスでもバックエンドは1回だけ生成される"""
+    created = []
+
+    class SlowBackend:
+        def __init__(self):
+            time.sleep(0.05)
+            created.append(self)
+
+        def flush(self):
+            pass
+
+    monkeypatch.setattr(storage, "_backend_cls", SlowBackend)
+    monkeypatch.setattr(storage, "_backend", None)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(storage._get_backend())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(created) == 1
+    assert all(r is created[0] for r in results)
+
+
+class TestDeleteProject:
+    """プロジェクト削除のテスト"""
+
+    def _wait_until_purged(self):
+        deleting_dir = os.path.join(self.temp_dir, ".deleting")
+        for _ in range(100):
+            if not os.listdir(deleting_dir):
+                return
+            time.sleep(0.01)
+        raise AssertionError("staged project was not removed")
+
+    def test_delete_project_returns_before_purge(self):
+        """削除直後からプロジェクトは見えなくなり、同じIDで作り直せる"""
+        storage.create_project("p")
+        storage.create_conversation("c1", "p")
+        storage.add_user_message("c1", "hello", "p")
+
+        storage.delete_project("p")
+
+        assert "p" not in storage.list_projects()
+        assert storage.get_conversation("c1", "p") is None
+        storage.create_conversation("c2", "p")
+        assert [c["id"] for c in storage.list_conversations("p")] == ["c2"]
+        self._wait_until_purged()
+
+    def test_delete_missing_project_is_noop(self):
+        """存在しないプロジェクトの削除はエラーにならない"""
+        storage.delete_project("missing")
+
+    def test_leftover_staging_is_purged_on_startup(self):
+        """前回のプロセスが残した退避ディレクトリは起動時に削除される"""
+        leftover = os.path.join(self.temp_dir, ".deleting", "p.old")
+        os.makedirs(os.path.join(leftover, "conversations"))
+        storage._get_backend()
+        self._wait_until_purged()
+
+
+class TestDelayedWrites:
+    """サマリー・設定の遅延書き込みのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def delayed(self, monkeypatch):
+        # タイマーでは書き出さず、flush()でだけ書き出されるよう十分長くする
+        monkeypatch.setattr(storage, "STORAGE_WRITE_DELAY_MS", 60_000)
+
+    def _summaries_path(self):
+        return os.path.join(self.temp_dir, "projects", "p", "summaries.json")
+
+    def test_writes_are_coalesced_until_flush(self, monkeypatch):
+        """連続した更新は書き出しまでファイルに書かれず、読み込みには反映される"""
+        writes = []
+        original = storage._atomic_write_json
+
+        def counting_write(path, data, **kwargs):
+            writes.append(path)
+            return original(path, data, **kwargs)
+
+        monkeypatch.setattr(storage, "_atomic_write_json", counting_write)
+
+        for i in range(20):
+            storage.add_summary({"conversation_id": f"c{i}", "summary": f"s{i}"}, "p", max_entries=15)
+
+        assert not os.path.exists(self._summaries_path())
+        assert len(storage.get_summaries("p")["entries"]) == 15
+
+        storage.flush()
+
+        assert writes == [self._summaries_path()]
+        with open(self._summaries_path()) as f:
+            assert len(json.load(f)["entries"]) == 15
+
+    def test_timer_flushes_pending_writes(self, monkeypatch):
+        """指定時間が経つと自動で書き出される"""
+        monkeypatch.setattr(storage, "STORAGE_WRITE_DELAY_MS", 10)
+        storage.save_config({"council_models": ["a"]}, "p")
+
+        path = os.path.join(self.temp_dir, "projects", "p", "config.json")
+        for _ in range(100):
+            if os.path.exists(path):
+                break
+            time.sleep(0.01)
+        with open(path) as f:
+            assert json.load(f) == {"council_models": ["a"]}
+
+    def test_delete_project_discards_pending_writes(self):
+        """削除したプロジェクトの書き込み待ちは書き出されない"""
+        storage.create_project("p")
+        storage.add_summary({"conversation_id": "c1", "summary": "s"}, "p")
+
+        storage.delete_project("p")
+        storage.flush()
+
+        assert not os.path.exists(self._summaries_path())
+        assert storage.get_summaries("p")["entries"] == []
+
+
+class TestBatch:
+    """batch() によるサマリー書き込みのまとめのテスト"""
+
+    def test_batch_writes_once_on_exit(self, monkeypatch):
+        """ブロック内の保存は抜けるときに1回だけ書かれ、ブロック内の読み込みには反映される"""
+        writes = []
+        original = storage._atomic_write_json
+        monkeypatch.setattr(
+            storage, "_atomic_write_json",
+            lambda path, data, **kwargs: writes.append(path) or original(path, data, **kwargs)
+        )
+        path = os.path.join(self.temp_dir, "projects", "p", "summaries.json")
+
+        with storage.batch("p"):
+            for i in range(20):
+                storage.add_summary({"conversation_id": f"c{i}", "summary": f"s{i}"}, "p")
+            assert not os.path.exists(path)
+            assert len(storage.get_summaries("p")["entries"]) == 15
+
+        assert writes == [path]
+        with open(path) as f:
+            assert json.load(f)["entries"][0]["conversation_id"] == "c19"
+
+    def test_other_projects_are_written_immediately(self):
+        """batch() 対象外のプロジェクトはその場で書かれる"""
+        with storage.batch("p"):
+            storage.add_summary({"conversation_id": "c1", "summary": "s"}, "q")
+            assert os.path.exists(os.path.join(self.temp_dir, "projects", "q", "summaries.json"))
+
+    def test_write_from_another_thread_during_batch_is_kept(self):
+        """batch() 中に別スレッドが同じファイルへ保存しても、抜けたときの書き出しで失われない"""
+        storage.add_summary({"conversation_id": "base", "summary": "s"}, "p")
+
+        with storage.batch("p"):
+            storage.add_summary({"conversation_id": "A", "summary": "s"}, "p")
+            other = threading.Thread(
+                target=storage.add_summary, args=({"conversation_id": "B", "summary": "s"}, "p")
+            )
+            other.start()
+            other.join()
+
+        path = os.path.join(self.temp_dir, "projects", "p", "summaries.json")
+        with open(path) as f:
+            ids = [e["conversation_id"] for e in json.load(f)["entries"]]
+        assert ids == ["B", "A", "base"]
+
+
+class TestMemoryBackend:
+    """インメモリバックエンドの会話操作のテスト"""
+
+    @pytest.fixture(autouse=True)
+    def use_memory_backend(self, monkeypatch):
+        monkeypatch.setattr(storage, "_backend_cls", storage.MemoryStorage)
+
+    def test_conversation_operations(self):
+        """作成・追記・タイトル変更・一覧・削除が他のバックエンドと同じように動く"""
+        storage.create_conversation("c1", "p")
+        storage.add_user_message("c1", "hello", "p")
+        storage.add_assistant_message("c1", [], [], {"response": "hi"}, "p")
+        storage.update_conversation_title("c1", "タイトル", "p")
+
+        conversation = storage.get_conversation("c1", "p")
+        assert [m["role"] for m in conversation["messages"]] == ["user", "assistant"]
+        assert storage.list_conversations("p") == [
+            {"id": "c1", "created_at": conversation["created_at"], "title": "タイトル", "message_count": 2}
+        ]
+        with pytest.raises(ValueError):
+            storage.add_user_message("missing", "hello", "p")
+
+        assert storage.delete_conversation("c1", "p") is True
+        assert storage.delete_conversation("c1", "p") is False
+        assert storage.list_conversations("p") == []
+        assert not os.listdir(self.temp_dir)
+
+    def test_returned_data_is_a_copy(self):
+        """取得した会話を書き換えても保存内容は変わらない"""
+        storage.create_conversation("c1", "p")
+        storage.get_conversation("c1", "p")["messages"].append({"role": "user", "content": "x"})
+        assert storage.get_conversation("c1", "p")["messages"] == []
@@ -0,0 +1,127 @@
+"""Unit tests for tools module."""
+
+import dataclasses
+import json
+
+import httpx
+import pytest
+
+from backend import tools
+
+
+# Tavilyの検索レスポンス（要約あり・フィールド欠落・300文字超の本文を含む）
+TAVILY_PAYLOAD = {
+    "answer": "Paris is the capital of France.",
+    "results": [
+        {"title": "France", "content": "Paris is the capital.", "url": "https://example.com/france"},
+        {"content": "x" * 400},
+    ],
+}
+
+
+@pytest.fixture
+def mock_tavily(monkeypatch):
+    """TavilyへのHTTPリクエストをMockTransportに差し替える
+
+    state["response"] に返すレスポンスdict（またはステータス制御用の httpx.Response）を設定する
+    """
+    state = {"response": TAVILY_PAYLOAD, "requests": [], "headers": [], "clients_created": 0}
+
+    def transport_handler(request: httpx.Request) -> httpx.Response:
+        state["requests"].append(json.loads(request.content))
+        state["headers"].append(request.headers)
+        result = state["response"]
+        if isinstance(result, httpx.Response):
+            return result
+        return httpx.Response(200, json=result)
+
+    transport = httpx.MockTransport(transport_handler)
+    async_client_cls = httpx.AsyncClient
+
+    def client_factory(*args, **kwargs):
+        state["clients_created"] += 1
+        return async_client_cls(*args, transport=transport, **kwargs)
+
+    monkeypatch.setattr(tools.httpx, "AsyncClient", client_factory)
+    monkeypatch.setattr(tools, "TAVILY_API_KEY", "test-key")
+    # 共有クライアントはテストごとに作り直す
+    monkeypatch.setattr(tools, "_client", None)
+    return state
+
+
+async def test_web_search_formats_results(mock_tavily):
+    """要約と各結果（タイトル・本文の先頭300文字・URL）をテキストに整形する"""
+    result = await tools.execute_web_search("capital of france")
+
+    assert result == (
+        "Summary: Paris is the capital of France.\n\n"
+        "Sources:"
+        "\n- France\n  Paris is the capital....\n  URL: https://example.com/france\n"
+        f"\n- No title\n  {'x' * 300}...\n  URL: \n"
+    )
+    assert mock_tavily["requests"] == [{
+        "api_key": "test-key",
+        "query": "capital of france",
+        "search_depth": "basic",
+        "max_results": 10,
+        "include_answer": True,
+    }]
+    assert mock_tavily["headers"][0]["Content-Type"] == "application/json"
+
+
+async def test_web_search_logs_result_count(mock_tavily):
+    """検索結果数を result_count として記録する"""
+    tool_logger = tools.ToolLogger()
+
+    await tools.execute_web_search("q", tool_logger)
+
+    [log] = tool_logger.get_logs()
+    assert log["result_count"] == 2
+    assert log["success"] is True
+    assert log["arguments"] == {"query": "q"}
+
+
+async def test_web_search_http_error_is_logged(mock_tavily):
+    """HTTPエラー時はエラーメッセージを返し、失敗として記録する"""
+    mock_tavily["response"] = httpx.Response(500, json={"error": "boom"})
+    tool_logger = tools.ToolLogger()
+
+    result = await tools.execute_web_search("q", tool_logger)
+
+    assert result.startswith("Error searching:")
+    [log] = tool_logger.get_logs()
+    assert log["success"] is False
+    assert log["result_count"] == 0
+
+
+async def test_shared_client_is_reused_and_rebuilt_after_close(mock_tavily):
+    """検索のたびに同じクライアントを使い回し、close_client() 後は作り直す"""
+    await tools.execute_web_search("a")
+    await tools.search_images("b")
+    assert mock_tavily["clients_created"] == 1
+    client = tools._client
+
+    await tools.close_client()
+    assert client.is_closed
+    assert tools._client is None
+
+    await tools.execute_web_search("c")
+    assert mock_tavily["clients_created"] == 2
+    assert tools._client is not client
+    assert len(mock_tavily["requests"]) == 3
+
+
+def test_get_logs_matches_asdict():
+    """get_logs は dataclasses.asdict と同じ形のdictを返し、引数は呼び出し側と共有しない"""
+    tool_logger = tools.ToolLogger()
+    arguments = {"query": "q"}
+    tool_logger.log_execution("web_search", arguments, "r" * 150, 12, result_count=3)
+    tool_logger.log_execution("unknown", {}, "", 0, success=False, error_message="Unknown tool: unknown")
+
+    logs = tool_logger.get_logs()
+
+    assert logs == [dataclasses.asdict(log) for log in tool_logger.logs]
+    assert list(logs[0]) == [f.name for f in dataclasses.fields(tools.ToolExecutionLog)]
+    assert logs[0]["result_preview"] == "r" * 100
+    logs[0]["arguments"]["query"] = "changed"
+    assert tool_logger.logs[0].arguments == {"query": "q"}